@@ -464,13 +464,14 @@ def verify_apk_signature(apk_path: str) -> dict:
         }
 
 
-def fast_manifest_read(apk_path: str) -> dict:
+def fast_manifest_read(apk_path: str, formatted: bool = False) -> dict:
     """
     快速读取APK中的AndroidManifest.xml
     使用APKEditor解码后读取
     
     Args:
         apk_path: APK文件路径
+        formatted: 是否直接返回带```xml代码块的内容（避免调用方再拼接一份大字符串）
     
     Returns:
         dict: {"success": bool, "manifest": str, "error": str}
@@ -509,7 +510,10 @@ def fast_manifest_read(apk_path: str) -> dict:
         
         if os.path.exists(manifest_path):
             with open(manifest_path, "r", encoding="utf-8") as f:
-                manifest_content = f.read()
+                if formatted:
+                    manifest_content = "".join(("```xml\n", f.read(), "\n```"))
+                else:
+                    manifest_content = f.read()
             return {
                 "success": True,
                 "manifest": manifest_content,
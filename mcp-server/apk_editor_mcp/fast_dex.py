@@ -2,12 +2,17 @@
 快速DEX编辑器 - Python包装器
 调用 dex-editor.jar 实现内存级DEX编辑
 """
+import codecs
+import locale
 import os
 import json
 import subprocess
+from collections import OrderedDict
 from typing import Optional, Dict, List, Any
 from pathlib import Path
 
+from .json_utils import loads
+
 # 获取JAR路径
 SCRIPT_DIR = Path(__file__).parent.parent
 DEX_EDITOR_JAR = os.environ.get(
@@ -16,23 +21,52 @@ DEX_EDITOR_JAR = os.environ.get(
 )
 JAVA_PATH = os.environ.get("JAVA_PATH", "java")
 
+# jar按平台默认编码读写stdin/stdout（与文本模式管道的默认编码一致）
+PIPE_ENCODING = locale.getpreferredencoding(False)
+_PIPE_IS_UTF8 = codecs.lookup(PIPE_ENCODING).name == "utf-8"
+
+# 本地缓存的类smali数量（分页时直接切片，不必每页都让jar重新生成整个类）
+SMALI_CACHE_SIZE = 32
+
 
 class FastDexEditor:
     """快速DEX编辑器 - 保持进程通信"""
     
     def __init__(self):
         self.process: Optional[subprocess.Popen] = None
+        # 类名 -> 完整smali，随会话变化（打开、修改、关闭、进程重启）失效
+        self._smali_cache: OrderedDict = OrderedDict()
+        # 会话代号：会话内容每变化一次加一
+        self._generation = 0
+    
+    def _reset_session(self):
+        """会话内容已变（打开、关闭、进程重启），清空本地缓存并递增会话代号"""
+        self._smali_cache.clear()
+        self._generation += 1
+    
+    def session_generation(self) -> int:
+        """
+        当前会话代号，打开、修改、关闭APK或进程退出/重启后都会变化，
+        调用方据此判断缓存的结果是否还对应当前内存中的DEX
+        """
+        self._discard_dead_process()
+        return self._generation
+    
+    def _discard_dead_process(self):
+        """进程已退出时丢弃它：内存中的DEX随之丢失，会话重置"""
+        if self.process is not None and self.process.poll() is not None:
+            self.process = None
+            self._reset_session()
     
     def _ensure_process(self):
         """确保进程在运行"""
-        if self.process is None or self.process.poll() is not None:
+        self._discard_dead_process()
+        if self.process is None:
             self.process = subprocess.Popen(
                 [JAVA_PATH, "-jar", DEX_EDITOR_JAR],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.DEVNULL,  # 忽略stderr
-                text=True,
-                bufsize=1
+                stderr=subprocess.DEVNULL  # 忽略stderr
             )
     
     def _send_command(self, command: str, args: List[str] = None) -> Dict[str, Any]:
@@ -41,26 +75,29 @@ class FastDexEditor:
         
         request = {"command": command, "args": args or []}
         try:
-            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.write((json.dumps(request) + "\n").encode(PIPE_ENCODING))
             self.process.stdin.flush()
             
-            # 读取多行JSON响应
+            # 读取多行JSON响应。UTF-8管道按字节计数花括号（多字节字符的字节都 >= 0x80，
+            # 不会误认成花括号），大响应不必先解码；其他编码（如GBK）的双字节字符
+            # 尾字节可能是 { 或 }，必须逐行解码后再计数
             lines = []
             brace_count = 0
             started = False
+            open_brace, close_brace = (b"{", b"}") if _PIPE_IS_UTF8 else ("{", "}")
             
             while True:
                 line = self.process.stdout.readline()
                 if not line:
                     break
+                if not _PIPE_IS_UTF8:
+                    line = line.decode(PIPE_ENCODING)
                 
                 # 计算花括号
-                for ch in line:
-                    if ch == '{':
-                        brace_count += 1
-                        started = True
-                    elif ch == '}':
-                        brace_count -= 1
+                opening = line.count(open_brace)
+                if opening:
+                    started = True
+                brace_count += opening - line.count(close_brace)
                 
                 if started:
                     lines.append(line)
@@ -72,8 +109,7 @@ class FastDexEditor:
             if not lines:
                 return {"success": False, "error": "No response from dex-editor"}
             
-            response_text = "".join(lines)
-            return json.loads(response_text)
+            return loads((b"" if _PIPE_IS_UTF8 else "").join(lines))
         except json.JSONDecodeError as e:
             return {"success": False, "error": f"JSON parse error: {e}"}
         except Exception as e:
@@ -81,6 +117,7 @@ class FastDexEditor:
     
     def open(self, apk_path: str) -> Dict[str, Any]:
         """打开APK文件"""
+        self._reset_session()
         return self._send_command("open", [apk_path])
     
     def list_classes(self, dex_name: str = None) -> Dict[str, Any]:
@@ -90,7 +127,14 @@ class FastDexEditor:
     
     def get_class(self, class_name: str) -> Dict[str, Any]:
         """获取类的smali代码"""
-        return self._send_command("get_class", [class_name])
+        response = self._send_command("get_class", [class_name])
+        smali = (response.get("data") or {}).get("smali") if response.get("success") else None
+        if isinstance(smali, str):
+            self._smali_cache[class_name] = smali
+            self._smali_cache.move_to_end(class_name)
+            if len(self._smali_cache) > SMALI_CACHE_SIZE:
+                self._smali_cache.popitem(last=False)
+        return response
     
     def get_method(self, class_name: str, method_name: str) -> Dict[str, Any]:
         """获取方法的smali代码"""
@@ -98,6 +142,8 @@ class FastDexEditor:
     
     def modify_class(self, class_name: str, smali_code: str) -> Dict[str, Any]:
         """修改类的smali代码"""
+        self._smali_cache.pop(class_name, None)
+        self._generation += 1
         return self._send_command("modify_class", [class_name, smali_code])
     
     def save(self, output_path: str = None) -> Dict[str, Any]:
@@ -118,8 +164,40 @@ class FastDexEditor:
         return self._send_command("summary", [class_name])
     
     def get_class_paged(self, class_name: str, offset: int = 0, limit: int = 0) -> Dict[str, Any]:
-        """分页获取smali代码"""
-        return self._send_command("get_paged", [class_name, str(offset), str(limit)])
+        """分页获取smali代码（首次取回整个类并缓存，之后各页在本地切片）"""
+        smali = self._smali_cache.get(class_name)
+        if smali is None:
+            response = self.get_class(class_name)
+            if not response.get("success"):
+                return response
+            smali = self._smali_cache.get(class_name)
+            if smali is None:
+                return self._send_command("get_paged", [class_name, str(offset), str(limit)])
+        else:
+            self._smali_cache.move_to_end(class_name)
+        
+        # 与jar端 getClassSmaliPaged 的分页规则一致（按字符偏移）
+        total_length = len(smali)
+        if limit <= 0:
+            return {"success": True, "data": {
+                "smali": smali,
+                "offset": 0,
+                "length": total_length,
+                "totalLength": total_length,
+                "hasMore": False
+            }}
+        
+        end_index = min(offset + limit, total_length)
+        if offset < 0 or offset > end_index:
+            return {"success": False, "error": f"begin {offset}, end {end_index}, length {total_length}"}
+        content = smali[offset:end_index]
+        return {"success": True, "data": {
+            "smali": content,
+            "offset": offset,
+            "length": len(content),
+            "totalLength": total_length,
+            "hasMore": end_index < total_length
+        }}
     
     def to_java(self, class_name: str) -> Dict[str, Any]:
         """smali转Java"""
@@ -131,6 +209,7 @@ class FastDexEditor:
     
     def close(self):
         """关闭编辑器"""
+        self._reset_session()
         if self.process is not None:
             try:
                 self._send_command("close")
@@ -202,6 +281,11 @@ def fast_dex_search_string(text: str) -> Dict[str, Any]:
     return get_editor().search_string(text)
 
 
+def fast_dex_session_generation() -> int:
+    """当前DEX会话的代号（会话内容或进程变化后递增）"""
+    return get_editor().session_generation()
+
+
 def fast_dex_close() -> Dict[str, Any]:
     """关闭编辑器"""
     get_editor().close()
@@ -1,10 +1,35 @@
 """文件操作工具"""
 import os
 import shutil
+import stat
 from pathlib import Path
 from typing import Optional
 from .config import MAX_FILE_SIZE, WORKSPACE_DIR
 
+# 写文件缓冲区：整块内容一次写入
+_WRITE_BUFFER_SIZE = 1 << 16
+
+# 临时文件名的重试次数（与 tempfile.mkstemp 相同）
+_TEMP_ATTEMPTS = 10000
+_TEMP_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+
+def resolved_path(path_str: str) -> str:
+    """
+    解析为真实路径（展开符号链接和 ..）
+    
+    每次调用都重新解析：链接可能被 file_delete/file_move 或外部工具改指向、删除，
+    缓存结果会把内容写到调用方没有指定的文件；写文件时用真实路径，
+    os.replace 替换的是链接指向的文件而不是链接本身
+    
+    Args:
+        path_str: 文件路径
+    
+    Returns:
+        str: 绝对真实路径
+    """
+    return os.path.realpath(path_str)
+
 
 def list_directory(
     dir_path: str,
@@ -107,34 +132,99 @@ def read_file(
         return {"success": False, "content": "", "error": str(e)}
 
 
+def _create_temp_file(path: Path) -> tuple[int, str]:
+    """
+    在目标文件同目录下独占创建临时文件
+    
+    用 0o666 创建，由内核按进程umask给出新文件的默认权限（不去读写umask，那会影响其他线程）
+    
+    Returns:
+        tuple: (文件描述符, 临时文件路径)
+    """
+    for _ in range(_TEMP_ATTEMPTS):
+        tmp_path = str(path.parent / f".{path.name}.{os.urandom(6).hex()}.tmp")
+        try:
+            return os.open(tmp_path, _TEMP_FLAGS, 0o666), tmp_path
+        except FileExistsError:
+            continue
+    raise FileExistsError(f"No usable temporary file name for: {path}")
+
+
+def encode_text(content: str, encoding: str = "utf-8") -> bytes:
+    """
+    按文本模式写文件的规则编码：换行符先转换为 os.linesep，得到的就是实际落盘的字节
+    
+    Args:
+        content: 文本内容
+        encoding: 编码
+    
+    Returns:
+        bytes: 写入文件的字节
+    """
+    if os.linesep != "\n":
+        content = content.replace("\n", os.linesep)
+    return content.encode(encoding)
+
+
 def write_file(
     file_path: str,
     content: str,
     encoding: str = "utf-8",
-    create_dirs: bool = True
+    create_dirs: bool = True,
+    prev_content: Optional[str] = None
 ) -> dict:
     """
-    写入文件内容
+    写入文件内容（先写同目录下的临时文件再 os.replace 替换，中途失败不会留下写了一半的文件）
+    
+    内容按 encode_text 编码后以二进制写入，与文本模式写出的字节相同
+    
+    符号链接按真实路径写入，替换的是链接指向的文件而不是链接本身；
+    有多个硬链接的文件无法整体替换（会与其他链接断开），这种情况直接原地重写
     
     Args:
         file_path: 文件路径
         content: 文件内容
         encoding: 编码
         create_dirs: 是否创建父目录
+        prev_content: 文件当前的内容（调用方刚读出的），与 content 相同时跳过写入
     
     Returns:
-        dict: {"success": bool, "error": str}
+        dict: {"success": bool, "error": str}，跳过写入时带 "skipped": True
     """
+    if prev_content is not None and content == prev_content:
+        return {"success": True, "error": "", "skipped": True}
+    
+    tmp_path = None
     try:
-        path = Path(file_path)
+        data = encode_text(content, encoding)
+        # 每次都重新解析真实路径，链接改指向或删除后不会写到旧目标
+        path = Path(os.path.realpath(file_path))
         
         if create_dirs:
             path.parent.mkdir(parents=True, exist_ok=True)
         
-        path.write_text(content, encoding=encoding)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            st = None
+        
+        if st is not None and st.st_nlink > 1:
+            with open(path, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+                f.write(data)
+            return {"success": True, "error": ""}
+        
+        fd, tmp_path = _create_temp_file(path)
+        with open(fd, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+            f.write(data)
+        # 替换已有文件时沿用原文件的权限位
+        if st is not None:
+            os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+        os.replace(tmp_path, path)
         return {"success": True, "error": ""}
     
     except Exception as e:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
         return {"success": False, "error": str(e)}
 
 
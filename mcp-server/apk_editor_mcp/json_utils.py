@@ -0,0 +1,85 @@
+"""JSON序列化工具（安装了orjson时使用orjson，否则退回标准库json）"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson是可选依赖
+    orjson = None
+
+# 超过这个大小的结果不再缩进：大结果（如整类smali）缩进只会拖慢编码、增加输出
+PRETTY_MAX_SIZE = 64 * 1024
+
+# 估算大小时每个未展开的值/容器元素按这么多字节计
+_VALUE_SIZE_ESTIMATE = 16
+# 估算时展开的嵌套层数：大结果的体积几乎都在前两层的字符串（content/smali）或长列表里
+_ESTIMATE_DEPTH = 2
+
+_ORJSON_OPTIONS = 0 if orjson is None else orjson.OPT_NON_STR_KEYS
+_ORJSON_PRETTY_OPTIONS = 0 if orjson is None else orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+
+
+def _estimate_size(value, depth: int = _ESTIMATE_DEPTH) -> int:
+    """
+    粗略估算值序列化后的大小，只为挑选输出格式，不必精确
+    
+    只展开前几层：字符串按长度计，更深的值和容器元素按固定大小计，
+    累计超过 PRETTY_MAX_SIZE 后立即返回
+    """
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        items = value.values()
+    elif isinstance(value, (list, tuple)):
+        items = value
+    else:
+        return _VALUE_SIZE_ESTIMATE
+    if depth == 0 or len(items) * _VALUE_SIZE_ESTIMATE >= PRETTY_MAX_SIZE:
+        return len(items) * _VALUE_SIZE_ESTIMATE
+    total = 0
+    for item in items:
+        total += _estimate_size(item, depth - 1)
+        if total >= PRETTY_MAX_SIZE:
+            break
+    return total
+
+
+def to_text(result, *, pretty: bool = True) -> str:
+    """
+    把结果序列化为返回文本：小结果缩进两格便于阅读，大结果保持紧凑
+    
+    按估算的大小选定格式后只序列化一次
+    
+    Args:
+        result: 结果（通常是dict）
+        pretty: 是否允许缩进
+    
+    Returns:
+        str: JSON文本（非ASCII字符原样输出）
+    """
+    indent = pretty and _estimate_size(result) < PRETTY_MAX_SIZE
+    if orjson is not None:
+        try:
+            return orjson.dumps(
+                result, option=_ORJSON_PRETTY_OPTIONS if indent else _ORJSON_OPTIONS
+            ).decode("utf-8")
+        except TypeError:
+            # orjson不支持的类型（如超过64位的整数），交给标准库处理
+            pass
+    
+    return json.dumps(result, indent=2 if indent else None, ensure_ascii=False)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    解析JSON，可以直接传入UTF-8字节，不必先解码成字符串
+    
+    Args:
+        data: JSON文本（str或UTF-8编码的bytes）
+    
+    Returns:
+        解析结果
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -1,7 +1,86 @@
 """搜索工具"""
 import re
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+
+# 跳过的二进制文件扩展名
+_BINARY_SUFFIXES = frozenset({".dex", ".so", ".png", ".jpg", ".gif", ".zip", ".apk"})
+
+
+def search_in_files_iter(
+    directory: str,
+    pattern: str,
+    file_extensions: Optional[list[str]] = None,
+    case_sensitive: bool = False,
+    is_regex: bool = False,
+    context_lines: int = 2,
+    stats: Optional[dict] = None
+) -> Iterator[dict]:
+    """
+    逐条产出文件搜索结果（生成器，不在内存中累积全部匹配）
+    
+    Args:
+        directory: 搜索目录
+        pattern: 搜索模式
+        file_extensions: 文件扩展名过滤 (如 [".smali", ".xml"])
+        case_sensitive: 是否区分大小写
+        is_regex: 是否使用正则表达式
+        context_lines: 上下文行数
+        stats: 可选统计字典，完整搜索过的文件数累加到 stats["files_searched"]
+    
+    Yields:
+        dict: {"file": str, "line_number": int, "line": str, "context": list}
+    """
+    path = Path(directory)
+    
+    # 编译搜索模式
+    flags = 0 if case_sensitive else re.IGNORECASE
+    if is_regex:
+        regex = re.compile(pattern, flags)
+    else:
+        regex = re.compile(re.escape(pattern), flags)
+    
+    extensions = {ext.lower() for ext in file_extensions} if file_extensions else None
+    
+    for file_path in path.rglob("*"):
+        if not file_path.is_file():
+            continue
+        
+        suffix = file_path.suffix.lower()
+        
+        # 扩展名过滤
+        if extensions is not None and suffix not in extensions:
+            continue
+        
+        # 跳过二进制文件
+        if suffix in _BINARY_SUFFIXES:
+            continue
+        
+        try:
+            content = file_path.read_text(encoding="utf-8", errors="ignore")
+        except Exception:
+            continue
+        
+        lines = content.split("\n")
+        rel_path = str(file_path.relative_to(path))
+        
+        for i, line in enumerate(lines):
+            if regex.search(line):
+                # 获取上下文
+                start = max(0, i - context_lines)
+                end = min(len(lines), i + context_lines + 1)
+                
+                yield {
+                    "file": rel_path,
+                    "line_number": i + 1,
+                    "line": line.strip(),
+                    "context": lines[start:end]
+                }
+        
+        if stats is not None:
+            stats["files_searched"] += 1
 
 
 def search_in_files(
@@ -11,7 +90,8 @@ def search_in_files(
     case_sensitive: bool = False,
     is_regex: bool = False,
     max_results: int = 100,
-    context_lines: int = 2
+    context_lines: int = 2,
+    offset: int = 0
 ) -> dict:
     """
     在文件中搜索内容
@@ -24,6 +104,7 @@ def search_in_files(
         is_regex: 是否使用正则表达式
         max_results: 最大结果数
         context_lines: 上下文行数
+        offset: 跳过前offset条结果（结果被截断时用返回的next_offset继续搜索）
     
     Returns:
         dict: {"success": bool, "results": list, "error": str}
@@ -33,70 +114,38 @@ def search_in_files(
         if not path.exists():
             return {"success": False, "results": [], "error": f"Directory not found: {directory}"}
         
-        # 编译搜索模式
-        flags = 0 if case_sensitive else re.IGNORECASE
-        if is_regex:
-            regex = re.compile(pattern, flags)
-        else:
-            regex = re.compile(re.escape(pattern), flags)
-        
-        results = []
-        files_searched = 0
-        
-        for file_path in path.rglob("*"):
-            if not file_path.is_file():
-                continue
-            
-            # 扩展名过滤
-            if file_extensions:
-                if file_path.suffix.lower() not in [ext.lower() for ext in file_extensions]:
-                    continue
-            
-            # 跳过二进制文件
-            if file_path.suffix.lower() in [".dex", ".so", ".png", ".jpg", ".gif", ".zip", ".apk"]:
-                continue
-            
-            try:
-                content = file_path.read_text(encoding="utf-8", errors="ignore")
-                lines = content.split("\n")
-                
-                for i, line in enumerate(lines):
-                    if regex.search(line):
-                        # 获取上下文
-                        start = max(0, i - context_lines)
-                        end = min(len(lines), i + context_lines + 1)
-                        context = lines[start:end]
-                        
-                        results.append({
-                            "file": str(file_path.relative_to(path)),
-                            "line_number": i + 1,
-                            "line": line.strip(),
-                            "context": context
-                        })
-                        
-                        if len(results) >= max_results:
-                            return {
-                                "success": True,
-                                "results": results,
-                                "total_found": len(results),
-                                "files_searched": files_searched,
-                                "truncated": True,
-                                "error": ""
-                            }
-                
-                files_searched += 1
-            
-            except Exception:
-                continue
+        stats = {"files_searched": 0}
+        matches = search_in_files_iter(
+            directory=directory,
+            pattern=pattern,
+            file_extensions=file_extensions,
+            case_sensitive=case_sensitive,
+            is_regex=is_regex,
+            context_lines=context_lines,
+            stats=stats
+        )
         
-        return {
+        # 每页至少一条：max_results<=0 时 next_offset 不前进，按它翻页的客户端会死循环
+        max_results = max(max_results, 1)
+        offset = max(offset, 0)
+        # 只取当前页，多取一条用于判断是否还有更多结果
+        results = list(islice(matches, offset, offset + max_results + 1))
+        truncated = len(results) > max_results
+        if truncated:
+            results.pop()
+        matches.close()
+        
+        result = {
             "success": True,
             "results": results,
             "total_found": len(results),
-            "files_searched": files_searched,
-            "truncated": False,
+            "files_searched": stats["files_searched"],
+            "truncated": truncated,
             "error": ""
         }
+        if truncated:
+            result["next_offset"] = offset + len(results)
+        return result
     
     except Exception as e:
         return {"success": False, "results": [], "error": str(e)}
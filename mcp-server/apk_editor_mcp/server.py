@@ -1,95 +1,89 @@
 """APK Editor MCP Server - 主入口"""
 import asyncio
-import json
+import importlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
 from .config import APKEDITOR_JAR, WORKSPACE_DIR, JAVA_PATH
-from .apk_editor import (
-    ensure_workspace,
-    decode_apk,
-    build_apk,
-    merge_apk,
-    refactor_apk,
-    protect_apk,
-    get_apk_info,
-    sign_apk,
-    verify_apk_signature,
-    fast_manifest_read,
-    fast_manifest_modify,
-    fast_manifest_patch
-)
-from .file_utils import (
-    list_directory,
-    read_file,
-    write_file,
-    delete_file,
-    copy_file,
-    move_file,
-    get_file_info,
-    file_patch,
-    file_insert
-)
-from .search_utils import (
-    search_in_files,
-    search_smali_method,
-    search_smali_string,
-    list_smali_classes,
-    find_smali_class
-)
-from .smali_utils import (
-    parse_smali_class,
-    get_method_from_smali,
-    replace_method_in_smali,
-    insert_smali_code,
-    generate_log_smali,
-    generate_return_smali
-)
-from .adb_utils import (
-    list_devices,
-    install_apk,
-    uninstall_app,
-    get_logcat,
-    take_screenshot,
-    get_device_info,
-    list_installed_packages,
-    clear_app_data
-)
-from .resource_utils import (
-    read_strings_xml,
-    modify_string,
-    batch_modify_strings,
-    read_colors_xml,
-    modify_color,
-    search_in_resources,
-    list_resource_files,
-    read_xml_resource,
-    modify_xml_resource,
-    add_string,
-    delete_string
-)
-from .fast_dex import (
-    fast_dex_open,
-    fast_dex_list_classes,
-    fast_dex_get_class,
-    fast_dex_get_method,
-    fast_dex_modify_class,
-    fast_dex_save,
-    fast_dex_search_class,
-    fast_dex_search_string,
-    fast_dex_close,
-    fast_dex_summary,
-    fast_dex_get_paged,
-    fast_dex_to_java,
-    fast_dex_deobfuscate,
-    fast_dex_decompile_package
-)
+from .json_utils import to_text
 
 # 创建服务器实例
 server = Server("apk-editor-mcp")
 
 
+# 后端模块按需加载：第一次用到某组工具时才导入对应模块
+_backend_modules: dict = {}
+
+
+def _backend(module: str):
+    """导入并缓存后端模块（相对于本包的模块名，如 ".fast_dex"）"""
+    mod = _backend_modules.get(module)
+    if mod is None:
+        mod = _backend_modules[module] = importlib.import_module(module, __package__)
+    return mod
+
+
+def _apk_editor():
+    """APK操作模块"""
+    return _backend(".apk_editor")
+
+
+def _file_utils():
+    """文件操作模块"""
+    return _backend(".file_utils")
+
+
+def _search_utils():
+    """搜索模块"""
+    return _backend(".search_utils")
+
+
+def _smali_utils():
+    """Smali操作模块"""
+    return _backend(".smali_utils")
+
+
+def _adb_utils():
+    """ADB工具模块"""
+    return _backend(".adb_utils")
+
+
+def _resource_utils():
+    """资源编辑模块"""
+    return _backend(".resource_utils")
+
+
+def _fast_dex():
+    """快速DEX编辑模块"""
+    return _backend(".fast_dex")
+
+
+# 公共参数定义
+_APK_PATH = {"type": "string", "description": "APK文件路径"}
+_OUTPUT_APK = {"type": "string", "description": "输出APK路径（可选）"}
+_FORCE = {"type": "boolean", "description": "强制覆盖"}
+
+
+def _apk_inout_schema(path_field: str = "apk_path", path_desc: str = None) -> dict:
+    """生成 输入路径 + output_apk + force 形式的inputSchema（共享参数定义）"""
+    path_prop = _APK_PATH if path_desc is None else {"type": "string", "description": path_desc}
+    return {
+        "type": "object",
+        "properties": {
+            path_field: path_prop,
+            "output_apk": _OUTPUT_APK,
+            "force": _FORCE
+        },
+        "required": [path_field]
+    }
+
+
 def get_all_tools() -> list[Tool]:
     """获取所有工具定义"""
     return [
@@ -100,7 +94,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
+                    "apk_path": _APK_PATH,
                     "output_dir": {"type": "string", "description": "输出目录（可选）"},
                     "decode_type": {"type": "string", "enum": ["xml", "json", "raw"], "description": "反编译类型"},
                     "skip_dex": {"type": "boolean", "description": "跳过DEX反编译"},
@@ -112,54 +106,22 @@ def get_all_tools() -> list[Tool]:
         Tool(
             name="apk_build",
             description="从反编译的目录构建APK文件（支持DEX缓存，速度快）",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "project_dir": {"type": "string", "description": "项目目录路径"},
-                    "output_apk": {"type": "string", "description": "输出APK路径（可选）"},
-                    "force": {"type": "boolean", "description": "强制覆盖"}
-                },
-                "required": ["project_dir"]
-            }
+            inputSchema=_apk_inout_schema("project_dir", "项目目录路径")
         ),
         Tool(
             name="apk_merge",
             description="合并分割的APK文件（XAPK, APKM, APKS等）为单个APK",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "input_path": {"type": "string", "description": "输入目录或文件路径"},
-                    "output_apk": {"type": "string", "description": "输出APK路径（可选）"},
-                    "force": {"type": "boolean", "description": "强制覆盖"}
-                },
-                "required": ["input_path"]
-            }
+            inputSchema=_apk_inout_schema("input_path", "输入目录或文件路径")
         ),
         Tool(
             name="apk_refactor",
             description="反资源混淆，恢复被混淆的资源名称",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
-                    "output_apk": {"type": "string", "description": "输出APK路径（可选）"},
-                    "force": {"type": "boolean", "description": "强制覆盖"}
-                },
-                "required": ["apk_path"]
-            }
+            inputSchema=_apk_inout_schema()
         ),
         Tool(
             name="apk_protect",
             description="保护/混淆APK资源文件，防止反编译",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
-                    "output_apk": {"type": "string", "description": "输出APK路径（可选）"},
-                    "force": {"type": "boolean", "description": "强制覆盖"}
-                },
-                "required": ["apk_path"]
-            }
+            inputSchema=_apk_inout_schema()
         ),
         Tool(
             name="apk_info",
@@ -167,7 +129,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
+                    "apk_path": _APK_PATH,
                     "verbose": {"type": "boolean", "description": "详细模式"},
                     "show_resources": {"type": "boolean", "description": "显示资源列表"},
                     "show_permissions": {"type": "boolean", "description": "显示权限列表"},
@@ -182,7 +144,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
+                    "apk_path": _APK_PATH,
                     "output_path": {"type": "string", "description": "输出路径（可选，默认添加_signed后缀）"},
                     "keystore": {"type": "string", "description": "keystore路径（可选，默认debug.keystore）"},
                     "keystore_pass": {"type": "string", "description": "keystore密码"},
@@ -198,7 +160,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"}
+                    "apk_path": _APK_PATH
                 },
                 "required": ["apk_path"]
             }
@@ -209,7 +171,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"}
+                    "apk_path": _APK_PATH
                 },
                 "required": ["apk_path"]
             }
@@ -220,7 +182,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
+                    "apk_path": _APK_PATH,
                     "new_manifest": {"type": "string", "description": "新的AndroidManifest.xml内容"},
                     "output_path": {"type": "string", "description": "输出路径（可选）"}
                 },
@@ -233,7 +195,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
+                    "apk_path": _APK_PATH,
                     "patches": {"type": "array", "description": "补丁列表 [{find: pattern, replace: replacement}]", "items": {"type": "object"}},
                     "output_path": {"type": "string", "description": "输出路径（可选）"}
                 },
@@ -372,7 +334,8 @@ def get_all_tools() -> list[Tool]:
                     "case_sensitive": {"type": "boolean", "description": "是否区分大小写"},
                     "is_regex": {"type": "boolean", "description": "是否使用正则表达式"},
                     "max_results": {"type": "integer", "description": "最大结果数"},
-                    "context_lines": {"type": "integer", "description": "上下文行数"}
+                    "context_lines": {"type": "integer", "description": "上下文行数"},
+                    "offset": {"type": "integer", "description": "结果偏移量（结果被截断时传入返回的next_offset继续获取）"}
                 },
                 "required": ["directory", "pattern"]
             }
@@ -511,7 +474,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"}
+                    "apk_path": _APK_PATH
                 },
                 "required": ["apk_path"]
             }
@@ -635,6 +598,29 @@ def get_all_tools() -> list[Tool]:
                 "required": ["pattern"]
             }
         ),
+        Tool(
+            name="fast_dex_batch",
+            description="【快速】批量执行多个fast_dex_*操作（一次调用，减少往返开销）",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "ops": {
+                        "type": "array",
+                        "description": "操作列表 [{name: 工具名, args: 参数}]，如 [{name: \"fast_dex_summary\", args: {class_name: \"Lcom/example/A;\"}}]",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string", "description": "fast_dex_*工具名"},
+                                "args": {"type": "object", "description": "工具参数"}
+                            },
+                            "required": ["name"]
+                        }
+                    },
+                    "stop_on_error": {"type": "boolean", "description": "遇到失败时停止后续操作（默认false）"}
+                },
+                "required": ["ops"]
+            }
+        ),
         
         # ===== ADB工具 =====
         Tool(
@@ -651,7 +637,7 @@ def get_all_tools() -> list[Tool]:
             inputSchema={
                 "type": "object",
                 "properties": {
-                    "apk_path": {"type": "string", "description": "APK文件路径"},
+                    "apk_path": _APK_PATH,
                     "device_id": {"type": "string", "description": "设备ID（可选，如果只有一个设备）"},
                     "replace": {"type": "boolean", "description": "是否替换已安装的应用"},
                     "grant_permissions": {"type": "boolean", "description": "是否自动授予权限"}
@@ -883,395 +869,807 @@ def get_all_tools() -> list[Tool]:
     ]
 
 
+# 各工具可选参数的默认值，调用前合并到arguments中，处理函数统一用[]取值
+_DEFAULTS: dict[str, dict] = {
+    "apk_decode": {"output_dir": None, "decode_type": "xml", "skip_dex": False, "force": True},
+    "apk_build": {"output_apk": None, "force": True},
+    "apk_merge": {"output_apk": None, "force": True},
+    "apk_refactor": {"output_apk": None, "force": True},
+    "apk_protect": {"output_apk": None, "force": True},
+    "apk_info": {"verbose": False, "show_resources": False, "show_permissions": False, "show_activities": False},
+    "apk_sign": {"output_path": None, "keystore": None, "keystore_pass": None, "key_alias": None, "key_pass": None},
+    "fast_manifest_modify": {"output_path": None},
+    "fast_manifest_patch": {"output_path": None},
+    "file_list": {"recursive": False, "include_size": True},
+    "file_read": {"encoding": "utf-8"},
+    "file_write": {"encoding": "utf-8"},
+    "file_patch": {"replace_all": False, "encoding": "utf-8"},
+    "file_insert": {"anchor": "", "encoding": "utf-8"},
+    "file_copy": {"overwrite": False},
+    "file_move": {"overwrite": False},
+    "search_text": {"file_extensions": None, "case_sensitive": False, "is_regex": False, "max_results": 100, "context_lines": 2, "offset": 0},
+    "search_method": {"max_results": 50},
+    "search_string": {"max_results": 50},
+    "smali_insert_code": {"position": "start"},
+    "smali_gen_log": {"register": "v0"},
+    "smali_gen_return": {"value": None},
+    "fast_dex_list_classes": {"dex_name": None},
+    "fast_dex_save": {"output_path": None},
+    "fast_dex_get_paged": {"offset": 0, "limit": 10000},
+    "fast_dex_batch": {"stop_on_error": False},
+    "adb_install": {"device_id": None, "replace": True, "grant_permissions": True},
+    "adb_uninstall": {"device_id": None},
+    "adb_logcat": {"device_id": None, "filter_tag": None, "lines": 100, "clear": False},
+    "adb_screenshot": {"device_id": None},
+    "adb_device_info": {"device_id": None},
+    "adb_list_packages": {"device_id": None, "filter_text": None},
+    "adb_clear_data": {"device_id": None},
+    "res_read_strings": {"language": ""},
+    "res_modify_string": {"language": ""},
+    "res_batch_modify_strings": {"language": ""},
+    "res_search": {"resource_types": None},
+    "res_add_string": {"language": ""},
+    "res_delete_string": {"language": ""}
+}
+_EMPTY: dict = {}
+
+
+# 工具定义在导入时构建一次，list_tools直接返回同一份列表
+_ALL_TOOLS: list[Tool] = get_all_tools()
+# 各工具的必填参数，调度前检查，缺参时不进入任何后端逻辑
+_REQUIRED_ARGS: dict[str, tuple] = {
+    tool.name: tuple(tool.inputSchema.get("required", ())) for tool in _ALL_TOOLS
+}
+
+
 @server.list_tools()
 async def list_tools() -> list[Tool]:
     """列出所有可用工具"""
-    return get_all_tools()
+    return _ALL_TOOLS
 
 
-@server.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """调用工具"""
-    result = {}
+def _missing_arguments(name: str, arguments: dict) -> list[str]:
+    """返回缺少的必填参数"""
+    return [arg for arg in _REQUIRED_ARGS.get(name, ()) if arg not in arguments]
+
+
+def _run_fast_dex_batch(ops: list, stop_on_error: bool = False) -> dict:
+    """
+    在一次调用内顺序执行多个fast_dex_*操作
     
-    try:
-        # APK操作
-        if name == "apk_decode":
-            result = decode_apk(
-                apk_path=arguments["apk_path"],
-                output_dir=arguments.get("output_dir"),
-                decode_type=arguments.get("decode_type", "xml"),
-                skip_dex=arguments.get("skip_dex", False),
-                force=arguments.get("force", True)
-            )
-        elif name == "apk_build":
-            result = build_apk(
-                project_dir=arguments["project_dir"],
-                output_apk=arguments.get("output_apk"),
-                force=arguments.get("force", True)
-            )
-        elif name == "apk_merge":
-            result = merge_apk(
-                input_path=arguments["input_path"],
-                output_apk=arguments.get("output_apk"),
-                force=arguments.get("force", True)
-            )
-        elif name == "apk_refactor":
-            result = refactor_apk(
-                apk_path=arguments["apk_path"],
-                output_apk=arguments.get("output_apk"),
-                force=arguments.get("force", True)
-            )
-        elif name == "apk_protect":
-            result = protect_apk(
-                apk_path=arguments["apk_path"],
-                output_apk=arguments.get("output_apk"),
-                force=arguments.get("force", True)
-            )
-        elif name == "apk_info":
-            result = get_apk_info(
-                apk_path=arguments["apk_path"],
-                verbose=arguments.get("verbose", False),
-                show_resources=arguments.get("show_resources", False),
-                show_permissions=arguments.get("show_permissions", False),
-                show_activities=arguments.get("show_activities", False)
-            )
-        elif name == "apk_sign":
-            result = sign_apk(
-                apk_path=arguments["apk_path"],
-                output_path=arguments.get("output_path"),
-                keystore=arguments.get("keystore"),
-                keystore_pass=arguments.get("keystore_pass"),
-                key_alias=arguments.get("key_alias"),
-                key_pass=arguments.get("key_pass")
-            )
-        elif name == "apk_verify":
-            result = verify_apk_signature(apk_path=arguments["apk_path"])
-        elif name == "fast_manifest_read":
-            result = fast_manifest_read(apk_path=arguments["apk_path"])
-            # 格式化显示
-            if result.get("success") and result.get("manifest"):
-                return [TextContent(type="text", text=f"```xml\n{result['manifest']}\n```")]
-        elif name == "fast_manifest_modify":
-            result = fast_manifest_modify(
-                apk_path=arguments["apk_path"],
-                new_manifest=arguments["new_manifest"],
-                output_path=arguments.get("output_path")
-            )
-        elif name == "fast_manifest_patch":
-            result = fast_manifest_patch(
-                apk_path=arguments["apk_path"],
-                patches=arguments["patches"],
-                output_path=arguments.get("output_path")
-            )
-        
-        # 文件操作
-        elif name == "file_list":
-            result = list_directory(
-                dir_path=arguments["dir_path"],
-                recursive=arguments.get("recursive", False),
-                include_size=arguments.get("include_size", True)
-            )
-        elif name == "file_read":
-            result = read_file(
-                file_path=arguments["file_path"],
-                encoding=arguments.get("encoding", "utf-8")
-            )
-        elif name == "file_write":
-            result = write_file(
-                file_path=arguments["file_path"],
-                content=arguments["content"],
-                encoding=arguments.get("encoding", "utf-8")
-            )
-        elif name == "file_patch":
-            result = file_patch(
-                file_path=arguments["file_path"],
-                old_string=arguments["old_string"],
-                new_string=arguments["new_string"],
-                replace_all=arguments.get("replace_all", False),
-                encoding=arguments.get("encoding", "utf-8")
-            )
-        elif name == "file_insert":
-            result = file_insert(
-                file_path=arguments["file_path"],
-                position=arguments["position"],
-                content=arguments["content"],
-                anchor=arguments.get("anchor", ""),
-                encoding=arguments.get("encoding", "utf-8")
-            )
-        elif name == "file_delete":
-            result = delete_file(file_path=arguments["file_path"])
-        elif name == "file_copy":
-            result = copy_file(
-                src=arguments["src"],
-                dst=arguments["dst"],
-                overwrite=arguments.get("overwrite", False)
-            )
-        elif name == "file_move":
-            result = move_file(
-                src=arguments["src"],
-                dst=arguments["dst"],
-                overwrite=arguments.get("overwrite", False)
-            )
-        elif name == "file_info":
-            result = get_file_info(file_path=arguments["file_path"])
-        
-        # 搜索
-        elif name == "search_text":
-            result = search_in_files(
-                directory=arguments["directory"],
-                pattern=arguments["pattern"],
-                file_extensions=arguments.get("file_extensions"),
-                case_sensitive=arguments.get("case_sensitive", False),
-                is_regex=arguments.get("is_regex", False),
-                max_results=arguments.get("max_results", 100),
-                context_lines=arguments.get("context_lines", 2)
-            )
-        elif name == "search_method":
-            result = search_smali_method(
-                directory=arguments["directory"],
-                method_pattern=arguments["method_pattern"],
-                max_results=arguments.get("max_results", 50)
-            )
-        elif name == "search_string":
-            result = search_smali_string(
-                directory=arguments["directory"],
-                string_value=arguments["string_value"],
-                max_results=arguments.get("max_results", 50)
-            )
-        elif name == "list_classes":
-            result = list_smali_classes(directory=arguments["directory"])
-        elif name == "find_class":
-            result = find_smali_class(
-                directory=arguments["directory"],
-                class_name=arguments["class_name"]
-            )
-        
-        # Smali操作
-        elif name == "smali_parse":
-            file_result = read_file(arguments["file_path"])
-            if file_result["success"]:
-                result = parse_smali_class(file_result["content"])
-                result["success"] = True
-            else:
-                result = file_result
-        elif name == "smali_get_method":
-            file_result = read_file(arguments["file_path"])
-            if file_result["success"]:
-                result = get_method_from_smali(file_result["content"], arguments["method_name"])
-            else:
-                result = file_result
-        elif name == "smali_replace_method":
-            file_result = read_file(arguments["file_path"])
-            if file_result["success"]:
-                result = replace_method_in_smali(
-                    file_result["content"],
-                    arguments["method_name"],
-                    arguments["new_method_body"]
-                )
-                if result["success"]:
-                    write_result = write_file(arguments["file_path"], result["content"])
-                    result["write_success"] = write_result["success"]
-            else:
-                result = file_result
-        elif name == "smali_insert_code":
-            file_result = read_file(arguments["file_path"])
-            if file_result["success"]:
-                result = insert_smali_code(
-                    file_result["content"],
-                    arguments["method_name"],
-                    arguments["code"],
-                    arguments.get("position", "start")
-                )
-                if result["success"]:
-                    write_result = write_file(arguments["file_path"], result["content"])
-                    result["write_success"] = write_result["success"]
+    Args:
+        ops: 操作列表 [{"name": 工具名, "args": 参数}]
+        stop_on_error: 遇到失败时是否停止
+    
+    Returns:
+        dict: {"success": bool, "results": list, "error": str}
+    """
+    results = []
+    all_success = True
+    
+    for op in ops:
+        op_name = sys.intern(op.get("name", ""))
+        if not op_name.startswith("fast_dex_") or op_name == "fast_dex_batch":
+            op_result = {"success": False, "error": f"Unsupported batch operation: {op_name}"}
+        else:
+            op_args = _DEFAULTS.get(op_name, _EMPTY) | (op.get("args") or _EMPTY)
+            missing = _missing_arguments(op_name, op_args)
+            if missing:
+                op_result = {"success": False, "error": f"Missing required arguments: {', '.join(missing)}"}
             else:
-                result = file_result
-        elif name == "smali_gen_log":
-            code = generate_log_smali(
-                arguments["tag"],
-                arguments["message"],
-                arguments.get("register", "v0")
-            )
-            result = {"success": True, "code": code}
-        elif name == "smali_gen_return":
-            code = generate_return_smali(
-                arguments["return_type"],
-                arguments.get("value")
-            )
-            result = {"success": True, "code": code}
-        
-        # 快速DEX编辑
-        elif name == "fast_dex_open":
-            result = fast_dex_open(arguments["apk_path"])
-        elif name == "fast_dex_list_classes":
-            result = fast_dex_list_classes(arguments.get("dex_name"))
-        elif name == "fast_dex_get_class":
-            result = fast_dex_get_class(arguments["class_name"])
-            # 将smali代码格式化显示
-            if result.get("success") and result.get("data", {}).get("smali"):
-                smali = result["data"]["smali"]
-                # 返回格式化的smali代码
-                return [TextContent(type="text", text=f"```smali\n{smali}\n```")]
-        elif name == "fast_dex_modify_class":
-            result = fast_dex_modify_class(arguments["class_name"], arguments["smali_code"])
-        elif name == "fast_dex_save":
-            result = fast_dex_save(arguments.get("output_path"))
-        elif name == "fast_dex_search_class":
-            result = fast_dex_search_class(arguments["pattern"])
-        elif name == "fast_dex_close":
-            result = fast_dex_close()
-        elif name == "fast_dex_summary":
-            result = fast_dex_summary(arguments["class_name"])
-        elif name == "fast_dex_get_paged":
-            result = fast_dex_get_paged(
-                arguments["class_name"],
-                arguments.get("offset", 0),
-                arguments.get("limit", 10000)
-            )
-            # 格式化显示
-            if result.get("success") and result.get("data", {}).get("smali"):
-                data = result["data"]
-                header = f"# 偏移: {data['offset']}, 长度: {data['length']}/{data['totalLength']}, 还有更多: {data['hasMore']}\n"
-                return [TextContent(type="text", text=f"```smali\n{header}{data['smali']}\n```")]
-        elif name == "fast_dex_to_java":
-            result = fast_dex_to_java(arguments["class_name"])
-            # 格式化显示Java代码
-            if result.get("success") and result.get("data", {}).get("java"):
-                java = result["data"]["java"]
-                return [TextContent(type="text", text=f"```java\n{java}\n```")]
-        elif name == "fast_dex_deobfuscate":
-            result = fast_dex_deobfuscate(arguments["class_name"])
-            if result.get("success") and result.get("data", {}).get("java"):
-                java = result["data"]["java"]
-                return [TextContent(type="text", text=f"```java\n// 反混淆后:\n{java}\n```")]
-        elif name == "fast_dex_decompile_package":
-            result = fast_dex_decompile_package(arguments["pattern"])
+                try:
+                    op_result = _dispatch(op_name, op_args)
+                except Exception as e:
+                    op_result = {"success": False, "error": str(e)}
+                if op_name not in _CACHEABLE_TOOLS:
+                    _invalidate_results(op_name, op_args)
         
-        # ADB工具
-        elif name == "adb_list_devices":
-            result = list_devices()
-        elif name == "adb_install":
-            result = install_apk(
-                apk_path=arguments["apk_path"],
-                device_id=arguments.get("device_id"),
-                replace=arguments.get("replace", True),
-                grant_permissions=arguments.get("grant_permissions", True)
-            )
-        elif name == "adb_uninstall":
-            result = uninstall_app(
-                package_name=arguments["package_name"],
-                device_id=arguments.get("device_id")
-            )
-        elif name == "adb_logcat":
-            result = get_logcat(
-                device_id=arguments.get("device_id"),
-                filter_tag=arguments.get("filter_tag"),
-                lines=arguments.get("lines", 100),
-                clear=arguments.get("clear", False)
-            )
-        elif name == "adb_screenshot":
-            result = take_screenshot(
-                output_path=arguments["output_path"],
-                device_id=arguments.get("device_id")
-            )
-        elif name == "adb_device_info":
-            result = get_device_info(device_id=arguments.get("device_id"))
-        elif name == "adb_list_packages":
-            result = list_installed_packages(
-                device_id=arguments.get("device_id"),
-                filter_text=arguments.get("filter_text")
-            )
-        elif name == "adb_clear_data":
-            result = clear_app_data(
-                package_name=arguments["package_name"],
-                device_id=arguments.get("device_id")
-            )
-        
-        # 资源编辑
-        elif name == "res_read_strings":
-            result = read_strings_xml(
-                project_path=arguments["project_path"],
-                language=arguments.get("language", "")
-            )
-        elif name == "res_modify_string":
-            result = modify_string(
-                project_path=arguments["project_path"],
-                string_name=arguments["string_name"],
-                new_value=arguments["new_value"],
-                language=arguments.get("language", "")
-            )
-        elif name == "res_batch_modify_strings":
-            result = batch_modify_strings(
-                project_path=arguments["project_path"],
-                modifications=arguments["modifications"],
-                language=arguments.get("language", "")
-            )
-        elif name == "res_read_colors":
-            result = read_colors_xml(project_path=arguments["project_path"])
-        elif name == "res_modify_color":
-            result = modify_color(
-                project_path=arguments["project_path"],
-                color_name=arguments["color_name"],
-                new_value=arguments["new_value"]
-            )
-        elif name == "res_search":
-            result = search_in_resources(
-                project_path=arguments["project_path"],
-                search_text=arguments["search_text"],
-                resource_types=arguments.get("resource_types")
-            )
-        elif name == "res_list_files":
-            result = list_resource_files(project_path=arguments["project_path"])
-        elif name == "res_read_xml":
-            result = read_xml_resource(
-                project_path=arguments["project_path"],
-                resource_path=arguments["resource_path"]
-            )
-            if result.get("success") and result.get("content"):
-                return [TextContent(type="text", text=f"```xml\n{result['content']}\n```")]
-        elif name == "res_modify_xml":
-            result = modify_xml_resource(
-                project_path=arguments["project_path"],
-                resource_path=arguments["resource_path"],
-                new_content=arguments["new_content"]
-            )
-        elif name == "res_add_string":
-            result = add_string(
-                project_path=arguments["project_path"],
-                string_name=arguments["string_name"],
-                string_value=arguments["string_value"],
-                language=arguments.get("language", "")
-            )
-        elif name == "res_delete_string":
-            result = delete_string(
-                project_path=arguments["project_path"],
-                string_name=arguments["string_name"],
-                language=arguments.get("language", "")
-            )
-        
-        # 系统
-        elif name == "get_workspace":
-            result = {
-                "success": True,
-                "workspace_dir": WORKSPACE_DIR,
-                "apkeditor_jar": APKEDITOR_JAR,
-                "java_path": JAVA_PATH
-            }
+        if isinstance(op_result, list):
+            # 已格式化的输出
+            op_result = {"success": True, "text": "".join(content.text for content in op_result)}
         
+        results.append({"name": op_name, "result": op_result})
+        if not op_result.get("success"):
+            all_success = False
+            if stop_on_error:
+                break
+    
+    return {"success": all_success, "results": results, "error": ""}
+
+
+# 各工具的处理函数：接收合并好默认值的arguments，返回结果字典或已格式化的list[TextContent]
+
+# APK操作
+def _handle_apk_decode(arguments: dict):
+    return _apk_editor().decode_apk(
+        apk_path=arguments["apk_path"],
+        output_dir=arguments["output_dir"],
+        decode_type=arguments["decode_type"],
+        skip_dex=arguments["skip_dex"],
+        force=arguments["force"]
+    )
+
+
+def _handle_apk_build(arguments: dict):
+    return _apk_editor().build_apk(
+        project_dir=arguments["project_dir"],
+        output_apk=arguments["output_apk"],
+        force=arguments["force"]
+    )
+
+
+def _handle_apk_merge(arguments: dict):
+    return _apk_editor().merge_apk(
+        input_path=arguments["input_path"],
+        output_apk=arguments["output_apk"],
+        force=arguments["force"]
+    )
+
+
+def _handle_apk_refactor(arguments: dict):
+    return _apk_editor().refactor_apk(
+        apk_path=arguments["apk_path"],
+        output_apk=arguments["output_apk"],
+        force=arguments["force"]
+    )
+
+
+def _handle_apk_protect(arguments: dict):
+    return _apk_editor().protect_apk(
+        apk_path=arguments["apk_path"],
+        output_apk=arguments["output_apk"],
+        force=arguments["force"]
+    )
+
+
+def _handle_apk_info(arguments: dict):
+    return _apk_editor().get_apk_info(
+        apk_path=arguments["apk_path"],
+        verbose=arguments["verbose"],
+        show_resources=arguments["show_resources"],
+        show_permissions=arguments["show_permissions"],
+        show_activities=arguments["show_activities"]
+    )
+
+
+def _handle_apk_sign(arguments: dict):
+    return _apk_editor().sign_apk(
+        apk_path=arguments["apk_path"],
+        output_path=arguments["output_path"],
+        keystore=arguments["keystore"],
+        keystore_pass=arguments["keystore_pass"],
+        key_alias=arguments["key_alias"],
+        key_pass=arguments["key_pass"]
+    )
+
+
+def _handle_apk_verify(arguments: dict):
+    return _apk_editor().verify_apk_signature(apk_path=arguments["apk_path"])
+
+
+def _handle_fast_manifest_read(arguments: dict):
+    result = _apk_editor().fast_manifest_read(apk_path=arguments["apk_path"], formatted=True)
+    # 格式化显示（manifest已是```xml代码块）
+    if result.get("success") and result.get("manifest"):
+        return [TextContent(type="text", text=result["manifest"])]
+    return result
+
+
+def _handle_fast_manifest_modify(arguments: dict):
+    return _apk_editor().fast_manifest_modify(
+        apk_path=arguments["apk_path"],
+        new_manifest=arguments["new_manifest"],
+        output_path=arguments["output_path"]
+    )
+
+
+def _handle_fast_manifest_patch(arguments: dict):
+    return _apk_editor().fast_manifest_patch(
+        apk_path=arguments["apk_path"],
+        patches=arguments["patches"],
+        output_path=arguments["output_path"]
+    )
+
+
+# 文件操作
+def _handle_file_list(arguments: dict):
+    return _file_utils().list_directory(
+        dir_path=arguments["dir_path"],
+        recursive=arguments["recursive"],
+        include_size=arguments["include_size"]
+    )
+
+
+def _handle_file_read(arguments: dict):
+    return _file_utils().read_file(
+        file_path=arguments["file_path"],
+        encoding=arguments["encoding"]
+    )
+
+
+def _handle_file_write(arguments: dict):
+    return _file_utils().write_file(
+        file_path=arguments["file_path"],
+        content=arguments["content"],
+        encoding=arguments["encoding"]
+    )
+
+
+def _handle_file_patch(arguments: dict):
+    return _file_utils().file_patch(
+        file_path=arguments["file_path"],
+        old_string=arguments["old_string"],
+        new_string=arguments["new_string"],
+        replace_all=arguments["replace_all"],
+        encoding=arguments["encoding"]
+    )
+
+
+def _handle_file_insert(arguments: dict):
+    return _file_utils().file_insert(
+        file_path=arguments["file_path"],
+        position=arguments["position"],
+        content=arguments["content"],
+        anchor=arguments["anchor"],
+        encoding=arguments["encoding"]
+    )
+
+
+def _handle_file_delete(arguments: dict):
+    return _file_utils().delete_file(file_path=arguments["file_path"])
+
+
+def _handle_file_copy(arguments: dict):
+    return _file_utils().copy_file(
+        src=arguments["src"],
+        dst=arguments["dst"],
+        overwrite=arguments["overwrite"]
+    )
+
+
+def _handle_file_move(arguments: dict):
+    return _file_utils().move_file(
+        src=arguments["src"],
+        dst=arguments["dst"],
+        overwrite=arguments["overwrite"]
+    )
+
+
+def _handle_file_info(arguments: dict):
+    return _file_utils().get_file_info(file_path=arguments["file_path"])
+
+
+# 搜索
+def _handle_search_text(arguments: dict):
+    return _search_utils().search_in_files(
+        directory=arguments["directory"],
+        pattern=arguments["pattern"],
+        file_extensions=arguments["file_extensions"],
+        case_sensitive=arguments["case_sensitive"],
+        is_regex=arguments["is_regex"],
+        max_results=arguments["max_results"],
+        context_lines=arguments["context_lines"],
+        offset=arguments["offset"]
+    )
+
+
+def _handle_search_method(arguments: dict):
+    return _search_utils().search_smali_method(
+        directory=arguments["directory"],
+        method_pattern=arguments["method_pattern"],
+        max_results=arguments["max_results"]
+    )
+
+
+def _handle_search_string(arguments: dict):
+    return _search_utils().search_smali_string(
+        directory=arguments["directory"],
+        string_value=arguments["string_value"],
+        max_results=arguments["max_results"]
+    )
+
+
+def _handle_list_classes(arguments: dict):
+    return _search_utils().list_smali_classes(directory=arguments["directory"])
+
+
+def _handle_find_class(arguments: dict):
+    return _search_utils().find_smali_class(
+        directory=arguments["directory"],
+        class_name=arguments["class_name"]
+    )
+
+
+# Smali操作
+def _handle_smali_parse(arguments: dict):
+    return _smali_utils().parse_smali_file(arguments["file_path"])
+
+
+def _handle_smali_get_method(arguments: dict):
+    return _smali_utils().get_method_from_smali_file(arguments["file_path"], arguments["method_name"])
+
+
+def _handle_smali_replace_method(arguments: dict):
+    return _smali_utils().replace_method_in_smali_file(
+        arguments["file_path"],
+        arguments["method_name"],
+        arguments["new_method_body"]
+    )
+
+
+def _handle_smali_insert_code(arguments: dict):
+    return _smali_utils().insert_smali_code_file(
+        arguments["file_path"],
+        arguments["method_name"],
+        arguments["code"],
+        arguments["position"]
+    )
+
+
+def _handle_smali_gen_log(arguments: dict):
+    code = _smali_utils().generate_log_smali(
+        arguments["tag"],
+        arguments["message"],
+        arguments["register"]
+    )
+    return {"success": True, "code": code}
+
+
+def _handle_smali_gen_return(arguments: dict):
+    code = _smali_utils().generate_return_smali(
+        arguments["return_type"],
+        arguments["value"]
+    )
+    return {"success": True, "code": code}
+
+
+# 快速DEX编辑
+def _handle_fast_dex_open(arguments: dict):
+    return _fast_dex().fast_dex_open(arguments["apk_path"])
+
+
+def _handle_fast_dex_list_classes(arguments: dict):
+    return _fast_dex().fast_dex_list_classes(arguments["dex_name"])
+
+
+def _handle_fast_dex_get_class(arguments: dict):
+    result = _fast_dex().fast_dex_get_class(arguments["class_name"])
+    # 将smali代码格式化显示
+    if result.get("success") and result.get("data", {}).get("smali"):
+        smali = result["data"]["smali"]
+        # 返回格式化的smali代码
+        return [TextContent(type="text", text="".join(("```smali\n", smali, "\n```")))]
+    return result
+
+
+def _handle_fast_dex_modify_class(arguments: dict):
+    return _fast_dex().fast_dex_modify_class(arguments["class_name"], arguments["smali_code"])
+
+
+def _handle_fast_dex_save(arguments: dict):
+    return _fast_dex().fast_dex_save(arguments["output_path"])
+
+
+def _handle_fast_dex_search_class(arguments: dict):
+    return _fast_dex().fast_dex_search_class(arguments["pattern"])
+
+
+def _handle_fast_dex_close(arguments: dict):
+    return _fast_dex().fast_dex_close()
+
+
+def _handle_fast_dex_summary(arguments: dict):
+    return _fast_dex().fast_dex_summary(arguments["class_name"])
+
+
+def _handle_fast_dex_get_paged(arguments: dict):
+    result = _fast_dex().fast_dex_get_paged(
+        arguments["class_name"],
+        arguments["offset"],
+        arguments["limit"]
+    )
+    # 格式化显示
+    if result.get("success") and result.get("data", {}).get("smali"):
+        data = result["data"]
+        header = f"# 偏移: {data['offset']}, 长度: {data['length']}/{data['totalLength']}, 还有更多: {data['hasMore']}\n"
+        return [TextContent(type="text", text="".join(("```smali\n", header, data["smali"], "\n```")))]
+    return result
+
+
+def _handle_fast_dex_to_java(arguments: dict):
+    result = _fast_dex().fast_dex_to_java(arguments["class_name"])
+    # 格式化显示Java代码
+    if result.get("success") and result.get("data", {}).get("java"):
+        java = result["data"]["java"]
+        return [TextContent(type="text", text="".join(("```java\n", java, "\n```")))]
+    return result
+
+
+def _handle_fast_dex_deobfuscate(arguments: dict):
+    result = _fast_dex().fast_dex_deobfuscate(arguments["class_name"])
+    if result.get("success") and result.get("data", {}).get("java"):
+        java = result["data"]["java"]
+        return [TextContent(type="text", text="".join(("```java\n// 反混淆后:\n", java, "\n```")))]
+    return result
+
+
+def _handle_fast_dex_decompile_package(arguments: dict):
+    return _fast_dex().fast_dex_decompile_package(arguments["pattern"])
+
+
+def _handle_fast_dex_batch(arguments: dict):
+    return _run_fast_dex_batch(arguments["ops"], arguments["stop_on_error"])
+
+
+# ADB工具
+def _handle_adb_list_devices(arguments: dict):
+    return _adb_utils().list_devices()
+
+
+def _handle_adb_install(arguments: dict):
+    return _adb_utils().install_apk(
+        apk_path=arguments["apk_path"],
+        device_id=arguments["device_id"],
+        replace=arguments["replace"],
+        grant_permissions=arguments["grant_permissions"]
+    )
+
+
+def _handle_adb_uninstall(arguments: dict):
+    return _adb_utils().uninstall_app(
+        package_name=arguments["package_name"],
+        device_id=arguments["device_id"]
+    )
+
+
+def _handle_adb_logcat(arguments: dict):
+    return _adb_utils().get_logcat(
+        device_id=arguments["device_id"],
+        filter_tag=arguments["filter_tag"],
+        lines=arguments["lines"],
+        clear=arguments["clear"]
+    )
+
+
+def _handle_adb_screenshot(arguments: dict):
+    return _adb_utils().take_screenshot(
+        output_path=arguments["output_path"],
+        device_id=arguments["device_id"]
+    )
+
+
+def _handle_adb_device_info(arguments: dict):
+    return _adb_utils().get_device_info(device_id=arguments["device_id"])
+
+
+def _handle_adb_list_packages(arguments: dict):
+    return _adb_utils().list_installed_packages(
+        device_id=arguments["device_id"],
+        filter_text=arguments["filter_text"]
+    )
+
+
+def _handle_adb_clear_data(arguments: dict):
+    return _adb_utils().clear_app_data(
+        package_name=arguments["package_name"],
+        device_id=arguments["device_id"]
+    )
+
+
+# 资源编辑
+def _handle_res_read_strings(arguments: dict):
+    return _resource_utils().read_strings_xml(
+        project_path=arguments["project_path"],
+        language=arguments["language"]
+    )
+
+
+def _handle_res_modify_string(arguments: dict):
+    return _resource_utils().modify_string(
+        project_path=arguments["project_path"],
+        string_name=arguments["string_name"],
+        new_value=arguments["new_value"],
+        language=arguments["language"]
+    )
+
+
+def _handle_res_batch_modify_strings(arguments: dict):
+    return _resource_utils().batch_modify_strings(
+        project_path=arguments["project_path"],
+        modifications=arguments["modifications"],
+        language=arguments["language"]
+    )
+
+
+def _handle_res_read_colors(arguments: dict):
+    return _resource_utils().read_colors_xml(project_path=arguments["project_path"])
+
+
+def _handle_res_modify_color(arguments: dict):
+    return _resource_utils().modify_color(
+        project_path=arguments["project_path"],
+        color_name=arguments["color_name"],
+        new_value=arguments["new_value"]
+    )
+
+
+def _handle_res_search(arguments: dict):
+    return _resource_utils().search_in_resources(
+        project_path=arguments["project_path"],
+        search_text=arguments["search_text"],
+        resource_types=arguments["resource_types"]
+    )
+
+
+def _handle_res_list_files(arguments: dict):
+    return _resource_utils().list_resource_files(project_path=arguments["project_path"])
+
+
+def _handle_res_read_xml(arguments: dict):
+    result = _resource_utils().read_xml_resource(
+        project_path=arguments["project_path"],
+        resource_path=arguments["resource_path"]
+    )
+    if result.get("success") and result.get("content"):
+        return [TextContent(type="text", text="".join(("```xml\n", result["content"], "\n```")))]
+    return result
+
+
+def _handle_res_modify_xml(arguments: dict):
+    return _resource_utils().modify_xml_resource(
+        project_path=arguments["project_path"],
+        resource_path=arguments["resource_path"],
+        new_content=arguments["new_content"]
+    )
+
+
+def _handle_res_add_string(arguments: dict):
+    return _resource_utils().add_string(
+        project_path=arguments["project_path"],
+        string_name=arguments["string_name"],
+        string_value=arguments["string_value"],
+        language=arguments["language"]
+    )
+
+
+def _handle_res_delete_string(arguments: dict):
+    return _resource_utils().delete_string(
+        project_path=arguments["project_path"],
+        string_name=arguments["string_name"],
+        language=arguments["language"]
+    )
+
+
+# 系统
+def _handle_get_workspace(arguments: dict):
+    return {
+        "success": True,
+        "workspace_dir": WORKSPACE_DIR,
+        "apkeditor_jar": APKEDITOR_JAR,
+        "java_path": JAVA_PATH
+    }
+
+
+# 工具名 -> 处理函数
+_HANDLERS = {
+    "apk_decode": _handle_apk_decode,
+    "apk_build": _handle_apk_build,
+    "apk_merge": _handle_apk_merge,
+    "apk_refactor": _handle_apk_refactor,
+    "apk_protect": _handle_apk_protect,
+    "apk_info": _handle_apk_info,
+    "apk_sign": _handle_apk_sign,
+    "apk_verify": _handle_apk_verify,
+    "fast_manifest_read": _handle_fast_manifest_read,
+    "fast_manifest_modify": _handle_fast_manifest_modify,
+    "fast_manifest_patch": _handle_fast_manifest_patch,
+    "file_list": _handle_file_list,
+    "file_read": _handle_file_read,
+    "file_write": _handle_file_write,
+    "file_patch": _handle_file_patch,
+    "file_insert": _handle_file_insert,
+    "file_delete": _handle_file_delete,
+    "file_copy": _handle_file_copy,
+    "file_move": _handle_file_move,
+    "file_info": _handle_file_info,
+    "search_text": _handle_search_text,
+    "search_method": _handle_search_method,
+    "search_string": _handle_search_string,
+    "list_classes": _handle_list_classes,
+    "find_class": _handle_find_class,
+    "smali_parse": _handle_smali_parse,
+    "smali_get_method": _handle_smali_get_method,
+    "smali_replace_method": _handle_smali_replace_method,
+    "smali_insert_code": _handle_smali_insert_code,
+    "smali_gen_log": _handle_smali_gen_log,
+    "smali_gen_return": _handle_smali_gen_return,
+    "fast_dex_open": _handle_fast_dex_open,
+    "fast_dex_list_classes": _handle_fast_dex_list_classes,
+    "fast_dex_get_class": _handle_fast_dex_get_class,
+    "fast_dex_modify_class": _handle_fast_dex_modify_class,
+    "fast_dex_save": _handle_fast_dex_save,
+    "fast_dex_search_class": _handle_fast_dex_search_class,
+    "fast_dex_close": _handle_fast_dex_close,
+    "fast_dex_summary": _handle_fast_dex_summary,
+    "fast_dex_get_paged": _handle_fast_dex_get_paged,
+    "fast_dex_to_java": _handle_fast_dex_to_java,
+    "fast_dex_deobfuscate": _handle_fast_dex_deobfuscate,
+    "fast_dex_decompile_package": _handle_fast_dex_decompile_package,
+    "fast_dex_batch": _handle_fast_dex_batch,
+    "adb_list_devices": _handle_adb_list_devices,
+    "adb_install": _handle_adb_install,
+    "adb_uninstall": _handle_adb_uninstall,
+    "adb_logcat": _handle_adb_logcat,
+    "adb_screenshot": _handle_adb_screenshot,
+    "adb_device_info": _handle_adb_device_info,
+    "adb_list_packages": _handle_adb_list_packages,
+    "adb_clear_data": _handle_adb_clear_data,
+    "res_read_strings": _handle_res_read_strings,
+    "res_modify_string": _handle_res_modify_string,
+    "res_batch_modify_strings": _handle_res_batch_modify_strings,
+    "res_read_colors": _handle_res_read_colors,
+    "res_modify_color": _handle_res_modify_color,
+    "res_search": _handle_res_search,
+    "res_list_files": _handle_res_list_files,
+    "res_read_xml": _handle_res_read_xml,
+    "res_modify_xml": _handle_res_modify_xml,
+    "res_add_string": _handle_res_add_string,
+    "res_delete_string": _handle_res_delete_string,
+    "get_workspace": _handle_get_workspace
+}
+
+
+def _dispatch(name: str, arguments: dict):
+    """
+    执行工具调用（按工具名查表分派）
+    
+    Returns:
+        dict: 结果字典；或 list[TextContent]: 已格式化好的输出
+    """
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        return {"success": False, "error": f"Unknown tool: {name}"}
+    return handler(arguments)
+
+
+# 只读工具的结果缓存：工具名 -> 决定结果是否有效的主文件参数（None表示依赖当前DEX会话）
+_CACHEABLE_TOOLS = {
+    "apk_info": "apk_path",
+    "fast_manifest_read": "apk_path",
+    "smali_parse": "file_path",
+    "smali_get_method": "file_path",
+    "fast_dex_list_classes": None,
+    "fast_dex_summary": None,
+    "fast_dex_get_class": None,
+    "fast_dex_get_paged": None,
+    "fast_dex_to_java": None
+}
+# 会改变DEX会话内容的工具
+_DEX_WRITE_TOOLS = frozenset({"fast_dex_open", "fast_dex_modify_class", "fast_dex_close"})
+# 结果缓存：键 -> (输出, 输出字符数)；条目数和输出总字符数两个上限，先到哪个按哪个淘汰
+_RESULT_CACHE_SIZE = 128
+_RESULT_CACHE_MAX_CHARS = 32 * 1024 * 1024
+_result_cache: OrderedDict = OrderedDict()
+_result_cache_chars = 0
+_dex_generation = 0
+
+
+def _result_cache_key(name: str, arguments: dict) -> Optional[tuple]:
+    """计算只读工具的缓存键，不可缓存时返回None"""
+    if name not in _CACHEABLE_TOOLS:
+        return None
+    primary_arg = _CACHEABLE_TOOLS[name]
+    try:
+        if primary_arg is None:
+            # DEX会话的结果同时随写操作和 dex-editor 进程的重新打开/重启失效
+            path, state = None, (_dex_generation, _fast_dex().fast_dex_session_generation())
         else:
-            result = {"success": False, "error": f"Unknown tool: {name}"}
+            path = arguments[primary_arg]
+            st = os.stat(path)
+            state = (st.st_mtime_ns, st.st_size)
+        key = (name, path, state, tuple(sorted(arguments.items())))
+        hash(key)
+        return key
+    except (KeyError, OSError, TypeError):
+        return None
+
+
+def _invalidate_results(name: str, arguments: dict):
+    """写操作后清除相关的缓存结果"""
+    global _dex_generation
+    if name in _DEX_WRITE_TOOLS:
+        _dex_generation += 1
+        return
+    paths = {value for value in arguments.values() if isinstance(value, str)}
+    for key in [key for key in _result_cache if key[1] in paths]:
+        _drop_result(key)
+
+
+def _drop_result(key: tuple):
+    """从结果缓存中移除一条并扣减占用"""
+    global _result_cache_chars
+    _result_cache_chars -= _result_cache.pop(key)[1]
+
+
+def _store_result(key: tuple, content: list):
+    """放入结果缓存，超出条目数或总字符数上限时淘汰最久未用的条目（刚放入的总是保留）"""
+    global _result_cache_chars
+    if key in _result_cache:
+        _drop_result(key)
+    size = sum(len(item.text) for item in content)
+    _result_cache[key] = (content, size)
+    _result_cache_chars += size
+    while len(_result_cache) > 1 and (
+        len(_result_cache) > _RESULT_CACHE_SIZE or _result_cache_chars > _RESULT_CACHE_MAX_CHARS
+    ):
+        _drop_result(next(iter(_result_cache)))
+
+
+@server.call_tool()
+async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+    """调用工具"""
+    # 工具名字面量在编译时已驻留，驻留传入的名字后查表和比较都是指针相等
+    name = sys.intern(name)
+    arguments = _DEFAULTS.get(name, _EMPTY) | arguments
+    
+    missing = _missing_arguments(name, arguments)
+    if missing:
+        result = {"success": False, "error": f"Missing required arguments: {', '.join(missing)}"}
+        return [TextContent(type="text", text=to_text(result))]
     
+    cache_key = _result_cache_key(name, arguments)
+    if cache_key is not None:
+        cached = _result_cache.get(cache_key)
+        if cached is not None:
+            _result_cache.move_to_end(cache_key)
+            return cached[0]
+    
+    try:
+        result = _dispatch(name, arguments)
     except Exception as e:
         result = {"success": False, "error": str(e)}
     
-    return [TextContent(type="text", text=json.dumps(result, indent=2, ensure_ascii=False))]
+    if isinstance(result, list):
+        # 已格式化的输出（只在成功时返回）
+        content = result
+    else:
+        content = [TextContent(type="text", text=to_text(result))]
+    
+    if cache_key is not None:
+        if isinstance(result, list) or result.get("success"):
+            _store_result(cache_key, content)
+    elif name not in _CACHEABLE_TOOLS:
+        _invalidate_results(name, arguments)
+    
+    return content
+
+
+# 启动时在后台预热的后端模块
+_BACKEND_MODULES = (
+    ".apk_editor",
+    ".file_utils",
+    ".search_utils",
+    ".smali_utils",
+    ".adb_utils",
+    ".resource_utils",
+    ".fast_dex"
+)
+
+
+def _prewarm():
+    """后台预热：提前加载后端模块，避免首个请求承担导入开销"""
+    for module in _BACKEND_MODULES:
+        try:
+            _backend(module)
+        except Exception as e:
+            # stdout 是 MCP 协议通道，诊断信息只能写到 stderr；请求到来时会再次导入并报告错误
+            print(f"Failed to preload backend module {module}: {e!r}", file=sys.stderr)
 
 
 async def run_server():
     """运行MCP服务器"""
-    ensure_workspace()
+    _apk_editor().ensure_workspace()
+    threading.Thread(target=_prewarm, name="prewarm", daemon=True).start()
     async with stdio_server() as (read_stream, write_stream):
         await server.run(read_stream, write_stream, server.create_initialization_options())
 
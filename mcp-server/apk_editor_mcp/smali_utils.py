@@ -1,8 +1,102 @@
 """Smali代码处理工具"""
+import hashlib
+import mmap
+import os
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
 from typing import Optional
 
+from .config import MAX_FILE_SIZE
+
+# 方法索引缓存：(绝对路径, 是否为文本偏移) -> ((st_mtime_ns, st_size), 索引)
+_METHOD_INDEX_CACHE_SIZE = 64
+_method_index_cache: OrderedDict = OrderedDict()
+_method_index_lock = threading.Lock()
+
+# 类解析结果缓存：内容的blake2b摘要 -> parse_smali_class 结果
+_PARSE_CACHE_SIZE = 32
+_parse_cache: OrderedDict = OrderedDict()
+# 解析缓存可能被多个线程同时访问（工具处理函数在线程池中执行）
+_parse_cache_lock = threading.Lock()
+
+
+# 所有正则在导入时编译一次。不加 re.ASCII：混淆后的类名、方法名常含非ASCII字符，\w 需要匹配它们
+# 类级指令、方法开始/结束合并成一个多分支正则，对整个内容做一次 finditer，
+# 只有命中指令的行才回到Python处理（[^\S\n] 是不含换行的空白，保证匹配不跨行）。
+# 各分支共用的 "\." 提到分支外面；除首行外都以换行符开头，正则引擎可以直接跳到换行处尝试，
+# 不必在每个字符上检查行首
+_DIRECTIVE_PATTERN = (
+    r'[^\S\n]*\.(?:'
+    r'class[^\S\n]+.*?(?P<cls>L[\w/$]+;)'
+    r'|super[^\S\n]+(?P<sup>L[\w/$]+;)'
+    r'|source[^\S\n]+"(?P<src>[^"\n]+)"'
+    r'|implements[^\S\n]+(?P<impl>L[\w/$]+;)'
+    r'|field[^\S\n]+(?P<facc>\S+)[^\S\n]+(?P<fname>\S+):(?P<ftype>\S+)'
+    r'|method[^\S\n]+(?P<macc>.+?)[^\S\n]+(?P<mname>\S+)\((?P<mparams>[^)\n]*)\)(?P<mret>\S+)'
+    r'|(?P<endm>end method)'
+    r')'
+)
+_RE_DIRECTIVE_FIRST = re.compile(_DIRECTIVE_PATTERN)
+_RE_DIRECTIVE = re.compile("\n" + _DIRECTIVE_PATTERN)
+_RE_METHOD = re.compile(r"\.method\s+(.+?)\s+(\S+)\(([^)]*)\)(\S+)")
+_RE_METHOD_BYTES = re.compile(rb"\.method\s+(.+?)\s+(\S+)\(([^)]*)\)(\S+)")
+
+
+def _on_class(result: dict, match: re.Match):
+    result["class_name"] = match.group("cls")
+
+
+def _on_super(result: dict, match: re.Match):
+    result["super_class"] = match.group("sup")
+
+
+def _on_source(result: dict, match: re.Match):
+    result["source_file"] = match.group("src")
+
+
+def _on_implements(result: dict, match: re.Match):
+    result["interfaces"].append(match.group("impl"))
+
+
+def _on_field(result: dict, match: re.Match):
+    result["fields"].append({
+        "access": match.group("facc"),
+        "name": match.group("fname"),
+        "type": match.group("ftype")
+    })
+
+
+# 类级指令：匹配分支的最后一个分组名 -> 处理函数
+_DIRECTIVES = {
+    "cls": _on_class,
+    "sup": _on_super,
+    "src": _on_source,
+    "impl": _on_implements,
+    "ftype": _on_field
+}
+
+
+def _check_smali_file(file_path: str) -> str:
+    """检查smali文件是否可读，返回错误信息（可读时为空串）"""
+    path = Path(file_path)
+    if not path.exists():
+        return f"File not found: {file_path}"
+    if not path.is_file():
+        return f"Not a file: {file_path}"
+    return ""
+
+
+def _check_smali_size(file_path: str) -> str:
+    """检查文件大小是否超过 MAX_FILE_SIZE，超过时返回错误信息，否则返回空串"""
+    size = os.path.getsize(file_path)
+    if size > MAX_FILE_SIZE:
+        return f"File too large: {size} bytes (max: {MAX_FILE_SIZE})"
+    return ""
+
 
 def parse_smali_class(content: str) -> dict:
     """
@@ -12,8 +106,27 @@ def parse_smali_class(content: str) -> dict:
         content: smali文件内容
     
     Returns:
-        dict: 解析后的类信息
+        dict: 解析后的类信息。方法不再复制方法体，而是记录
+              body_start/body_end（在content中的字符偏移），用 get_method_body 按需切片。
+              相同内容返回缓存中的同一个dict，调用方不要修改它
     """
+    key = hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    with _parse_cache_lock:
+        result = _parse_cache.get(key)
+        if result is not None:
+            _parse_cache.move_to_end(key)
+            return result
+    
+    result = _parse_smali_content(content)
+    with _parse_cache_lock:
+        _parse_cache[key] = result
+        if len(_parse_cache) > _PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return result
+
+
+def _parse_smali_content(content: str) -> dict:
+    """parse_smali_class 的实际解析（不经过缓存）"""
     result = {
         "class_name": "",
         "super_class": "",
@@ -23,164 +136,447 @@ def parse_smali_class(content: str) -> dict:
         "methods": []
     }
     
-    lines = content.split("\n")
     current_method = None
-    method_lines = []
+    count = content.count
+    find = content.find
+    line_no = 1
+    pos = 0
     
-    for line in lines:
-        line = line.strip()
-        
-        # 类名
-        if line.startswith(".class"):
-            match = re.search(r"\.class\s+.*?(L[\w/$]+;)", line)
-            if match:
-                result["class_name"] = match.group(1)
+    first = _RE_DIRECTIVE_FIRST.match(content)
+    matches = _RE_DIRECTIVE.finditer(content)
+    for match in chain((first,), matches) if first else matches:
+        kind = match.lastgroup
+        # 除首行外，匹配从上一行的换行符开始
+        line_start = match.start() if match is first else match.start() + 1
+        line_no += count("\n", pos, line_start)
+        pos = line_start
         
-        # 父类
-        elif line.startswith(".super"):
-            match = re.search(r"\.super\s+(L[\w/$]+;)", line)
-            if match:
-                result["super_class"] = match.group(1)
+        # 类名、父类、源文件、接口、字段
+        handler = _DIRECTIVES.get(kind)
+        if handler is not None:
+            handler(result, match)
+            continue
         
-        # 源文件
-        elif line.startswith(".source"):
-            match = re.search(r'\.source\s+"([^"]+)"', line)
-            if match:
-                result["source_file"] = match.group(1)
-        
-        # 接口
-        elif line.startswith(".implements"):
-            match = re.search(r"\.implements\s+(L[\w/$]+;)", line)
-            if match:
-                result["interfaces"].append(match.group(1))
-        
-        # 字段
-        elif line.startswith(".field"):
-            match = re.search(r"\.field\s+(\S+)\s+(\S+):(\S+)", line)
-            if match:
-                result["fields"].append({
-                    "access": match.group(1),
-                    "name": match.group(2),
-                    "type": match.group(3)
-                })
+        line_end = find("\n", line_start)
+        if line_end < 0:
+            line_end = len(content)
         
         # 方法开始
-        elif line.startswith(".method"):
-            match = re.search(r"\.method\s+(.+?)\s+(\S+)\(([^)]*)\)(\S+)", line)
-            if match:
-                current_method = {
-                    "access": match.group(1),
-                    "name": match.group(2),
-                    "params": match.group(3),
-                    "return_type": match.group(4),
-                    "full_signature": line,
-                    "start_line": len(method_lines)
-                }
-                method_lines = [line]
+        if kind == "mret":
+            current_method = {
+                "access": match.group("macc"),
+                "name": match.group("mname"),
+                "params": match.group("mparams"),
+                "return_type": match.group("mret"),
+                "full_signature": content[line_start:line_end].strip(),
+                "start_line": line_no,
+                "body_start": line_start
+            }
         
         # 方法结束
-        elif line.startswith(".end method"):
-            if current_method:
-                method_lines.append(line)
-                current_method["body"] = "\n".join(method_lines)
-                current_method["line_count"] = len(method_lines)
-                result["methods"].append(current_method)
-                current_method = None
-                method_lines = []
-        
-        # 方法体
         elif current_method:
-            method_lines.append(line)
+            current_method["body_end"] = line_end
+            current_method["line_count"] = line_no - current_method["start_line"] + 1
+            result["methods"].append(current_method)
+            current_method = None
     
     return result
 
 
-def get_method_from_smali(content: str, method_name: str) -> dict:
+def get_method_body(content: str, method: dict) -> str:
     """
-    从smali内容中提取指定方法
+    按 parse_smali_class 记录的偏移取出方法代码（从 .method 到 .end method）
+    
+    Args:
+        content: 解析时使用的smali文件内容
+        method: parse_smali_class 返回的 methods 中的一项
+    
+    Returns:
+        str: 方法代码
+    """
+    return content[method["body_start"]:method["body_end"]]
+
+
+def _method_needle(method_name: str) -> str:
+    """
+    生成匹配方法声明行的子串
+    
+    只给方法名时匹配 " name("，避免 isVip 误匹配 isVipUser 或注释中的名字；
+    传入带参数的签名（如 "isVip(I)Z"）时按原样匹配，用于区分重载
+    """
+    if "(" in method_name:
+        return f" {method_name}"
+    return f" {method_name}("
+
+
+def get_method_from_smali(
+    content: str,
+    method_name: str,
+    method_index: Optional[dict] = None
+) -> dict:
+    """
+    从smali内容中提取指定方法（按偏移定位后直接切片，不逐行扫描）
     
     Args:
         content: smali文件内容
-        method_name: 方法名
+        method_name: 方法名（或带参数的签名，如 "isVip(I)Z"）
+        method_index: content 的方法索引（build_method_index 的结果），给出时直接按索引定位
     
     Returns:
         dict: {"success": bool, "method": str, "error": str}
     """
     try:
-        lines = content.split("\n")
-        in_method = False
-        method_lines = []
-        
-        for i, line in enumerate(lines):
-            if f".method" in line and method_name in line:
-                in_method = True
-                method_lines = [line]
-                start_line = i + 1
-            elif in_method:
-                method_lines.append(line)
-                if line.strip() == ".end method":
-                    return {
-                        "success": True,
-                        "method": "\n".join(method_lines),
-                        "start_line": start_line,
-                        "end_line": i + 1,
-                        "error": ""
-                    }
-        
+        start, end_start, end = _locate_method(content, method_name, method_index)
+        if start < 0 or end_start == len(content):
+            return {
+                "success": False,
+                "method": "",
+                "error": f"Method not found: {method_name}"
+            }
+        method = content[start:end]
+        start_line = content.count("\n", 0, start) + 1
+        return {
+            "success": True,
+            "method": method,
+            "start_line": start_line,
+            "end_line": start_line + method.count("\n"),
+            "error": ""
+        }
+    
+    except Exception as e:
+        return {"success": False, "method": "", "error": str(e)}
+
+
+def parse_smali_file(file_path: str, encoding: str = "utf-8") -> dict:
+    """
+    解析smali文件（一次读入后整体做正则扫描）
+    
+    Args:
+        file_path: smali文件路径
+        encoding: 文件编码
+    
+    Returns:
+        dict: 解析后的类信息，附带success/error
+    """
+    error = _check_smali_file(file_path)
+    if error:
+        return {"success": False, "error": error}
+    
+    try:
+        error = _check_smali_size(file_path)
+        if error:
+            return {"success": False, "error": error}
+        with open(file_path, "r", encoding=encoding) as f:
+            result = parse_smali_class(f.read())
+    except (OSError, UnicodeDecodeError) as e:
+        return {"success": False, "error": str(e)}
+    # 缓存中的结果是共享的，复制一层再附加success
+    return {**result, "success": True}
+
+
+def get_method_from_smali_file(file_path: str, method_name: str, encoding: str = "utf-8") -> dict:
+    """
+    从smali文件中提取指定方法（mmap映射文件，按字节查找，只解码方法本身）
+    
+    Args:
+        file_path: smali文件路径
+        method_name: 方法名（或带参数的签名）
+        encoding: 文件编码
+    
+    Returns:
+        dict: {"success": bool, "method": str, "error": str}
+    """
+    error = _check_smali_file(file_path)
+    if error:
+        return {"success": False, "method": "", "error": error}
+    
+    not_found = {"success": False, "method": "", "error": f"Method not found: {method_name}"}
+    try:
+        with open(file_path, "rb") as f:
+            # 空文件无法mmap
+            if os.fstat(f.fileno()).st_size == 0:
+                return not_found
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                index = cached_method_index(file_path, data)
+                start, end_start, end = _locate_method(data, method_name, index)
+                if start < 0 or end_start == len(data):
+                    return not_found
+                method = data[start:end]
+                start_line = data[:start].count(b"\n") + 1
         return {
-            "success": False,
-            "method": "",
-            "error": f"Method not found: {method_name}"
+            "success": True,
+            "method": _decode_text(method, encoding),
+            "start_line": start_line,
+            "end_line": start_line + method.count(b"\n"),
+            "error": ""
         }
     
     except Exception as e:
         return {"success": False, "method": "", "error": str(e)}
 
 
+def _read_smali_bytes(file_path: str) -> tuple[bytes, str]:
+    """
+    以字节读取smali文件，用于编辑
+    
+    Returns:
+        tuple: (文件内容, 错误信息)，出错时内容为 b""
+    """
+    error = _check_smali_file(file_path)
+    if error:
+        return b"", error
+    try:
+        error = _check_smali_size(file_path)
+        if error:
+            return b"", error
+        with open(file_path, "rb") as f:
+            return f.read(), ""
+    except OSError as e:
+        return b"", str(e)
+
+
+def _typed(content, text: str):
+    """按内容类型（str或字节）返回对应类型的查找串"""
+    return text if isinstance(content, str) else text.encode("utf-8")
+
+
+def _find_directive_line(content: str, directive: str, pos: int = 0, exact: bool = False) -> tuple[int, int]:
+    """
+    从pos开始查找以directive开头的行（行首只允许空白）
+    
+    Args:
+        content: smali文件内容（str，或bytes/mmap）
+        directive: 指令，如 ".method"
+        pos: 起始位置
+        exact: 是否要求整行（去掉空白后）恰好等于directive
+    
+    Returns:
+        tuple: (行首偏移, 行尾偏移（不含换行）)，未找到时为 (-1, -1)
+    """
+    find = content.find
+    newline = _typed(content, "\n")
+    directive = _typed(content, directive)
+    while True:
+        idx = find(directive, pos)
+        if idx < 0:
+            return -1, -1
+        line_start = content.rfind(newline, 0, idx) + 1
+        line_end = find(newline, idx)
+        if line_end < 0:
+            line_end = len(content)
+        if not content[line_start:idx].strip() and (
+            not exact or not content[idx + len(directive):line_end].strip()
+        ):
+            return line_start, line_end
+        pos = idx + len(directive)
+
+
+def _find_method_offset(content, method_name: str) -> tuple[int, int]:
+    """
+    直接查找方法名（" name(" 这样的字面串，str/bytes.find 在C层跳跃匹配），
+    再确认命中所在的行是 .method 行，不必逐个检查文件里的每个 .method 行
+    
+    Args:
+        content: smali文件内容（str，或bytes/mmap）
+        method_name: 方法名（或带参数的签名）
+    
+    Returns:
+        tuple: 第一个匹配方法的 (.method行首, 行尾)，未找到时为 (-1, -1)
+    """
+    needle = _typed(content, _method_needle(method_name))
+    newline = _typed(content, "\n")
+    directive = _typed(content, ".method")
+    find = content.find
+    pos = 0
+    while True:
+        idx = find(needle, pos)
+        if idx < 0:
+            return -1, -1
+        line_start = content.rfind(newline, 0, idx) + 1
+        line_end = find(newline, idx)
+        if line_end < 0:
+            line_end = len(content)
+        if content[line_start:idx].lstrip().startswith(directive):
+            return line_start, line_end
+        pos = line_end
+
+
+def _find_method_span(content: str, method_name: str) -> tuple[int, int, int]:
+    """
+    定位方法在内容中的位置（find 查找，不逐行遍历）
+    
+    Args:
+        content: smali文件内容（str，或bytes/mmap，偏移单位随之为字符或字节）
+        method_name: 方法名（或带参数的签名）
+    
+    Returns:
+        tuple: (.method行首, .end method行首, .end method行尾)，未找到时均为 -1；
+               缺少 .end method 时后两项为 len(content)
+    """
+    start, line_end = _find_method_offset(content, method_name)
+    if start < 0:
+        return -1, -1, -1
+    
+    end_start, end = _find_directive_line(content, ".end method", line_end, exact=True)
+    if end_start < 0:
+        return start, len(content), len(content)
+    return start, end_start, end
+
+
+def build_method_index(content: str) -> dict:
+    """
+    一次扫描建立方法索引
+    
+    Args:
+        content: smali文件内容（str，或bytes/mmap）
+    
+    Returns:
+        dict: {方法名或完整签名(如 "isVip(I)Z"): (.method行首, .end method行首, .end method行尾)}，
+              同名方法（重载）以第一个为准
+    """
+    index = {}
+    is_text = isinstance(content, str)
+    method_re = _RE_METHOD if is_text else _RE_METHOD_BYTES
+    pos = 0
+    while True:
+        start, line_end = _find_directive_line(content, ".method", pos)
+        if start < 0:
+            return index
+        end_start, end = _find_directive_line(content, ".end method", line_end, exact=True)
+        if end_start < 0:
+            end_start = end = len(content)
+        match = method_re.match(content[start:line_end].strip())
+        if match:
+            span = (start, end_start, end)
+            name, params, return_type = match.group(2, 3, 4)
+            if not is_text:
+                name, params, return_type = (
+                    name.decode("utf-8", "replace"),
+                    params.decode("utf-8", "replace"),
+                    return_type.decode("utf-8", "replace")
+                )
+            index.setdefault(name, span)
+            index.setdefault(f"{name}({params}){return_type}", span)
+        pos = end
+
+
+def cached_method_index(file_path: str, content, version: Optional[tuple] = None) -> dict:
+    """
+    取文件的方法索引，按 (路径, mtime_ns, size) 缓存；文件变化后自动重建
+    
+    str 内容的索引是字符偏移，bytes/mmap 的是字节偏移，两者分开缓存
+    
+    Args:
+        file_path: smali文件路径
+        content: 刚读取的文件内容（str，或bytes/mmap；缓存未命中时用它建索引）
+        version: 读取 content 时文件的 (mtime_ns, size)；不给时现取文件状态
+    """
+    if version is None:
+        st = os.stat(file_path)
+        version = (st.st_mtime_ns, st.st_size)
+    key = (os.path.abspath(file_path), isinstance(content, str))
+    with _method_index_lock:
+        cached = _method_index_cache.get(key)
+        if cached is not None and cached[0] == version:
+            _method_index_cache.move_to_end(key)
+            return cached[1]
+    
+    index = build_method_index(content)
+    _put_method_index(key, version, index)
+    return index
+
+
+def _store_method_index(file_path: str, index: Optional[dict]):
+    """按文件当前状态保存（字节偏移的）方法索引，index为None时清除"""
+    key = (os.path.abspath(file_path), False)
+    if index is None:
+        with _method_index_lock:
+            _method_index_cache.pop(key, None)
+        return
+    st = os.stat(file_path)
+    _put_method_index(key, (st.st_mtime_ns, st.st_size), index)
+
+
+def _put_method_index(key: tuple, version: tuple, index: dict):
+    """写入方法索引缓存"""
+    with _method_index_lock:
+        _method_index_cache[key] = (version, index)
+        _method_index_cache.move_to_end(key)
+        if len(_method_index_cache) > _METHOD_INDEX_CACHE_SIZE:
+            _method_index_cache.popitem(last=False)
+
+
+def _splice_index(index: dict, start: int, end: int, text: str) -> dict:
+    """
+    content[start:end] 被替换为 text 后，推算新的方法索引（不重新扫描整个文件）
+    
+    与被替换区间重叠的方法被丢弃，之后的偏移整体平移，text 中的方法按位置补入
+    """
+    delta = len(text) - (end - start)
+    
+    def shift(offset: int) -> int:
+        return offset + delta if offset >= end else offset
+    
+    new_index = {}
+    for key, (s_, es, e) in index.items():
+        if start <= s_ < end:
+            continue
+        new_index[key] = (shift(s_), shift(es), shift(e))
+    
+    for key, (s_, es, e) in build_method_index(text).items():
+        span = (s_ + start, es + start, e + start)
+        if key not in new_index or new_index[key][0] > span[0]:
+            new_index[key] = span
+    return new_index
+
+
+def _locate_method(content: str, method_name: str, method_index: Optional[dict] = None) -> tuple[int, int, int]:
+    """优先用方法索引定位方法，索引未命中或与内容不符时退回扫描"""
+    if method_index is not None:
+        span = method_index.get(method_name)
+        if span is not None:
+            start, end_start, end = span
+            line_end = content.find(_typed(content, "\n"), start)
+            if line_end < 0:
+                line_end = len(content)
+            if (_typed(content, _method_needle(method_name)) in content[start:line_end]
+                    and (end_start == len(content)
+                         or content[end_start:end].strip() == _typed(content, ".end method"))):
+                return span
+    return _find_method_span(content, method_name)
+
+
 def replace_method_in_smali(
     content: str,
     method_name: str,
-    new_method_body: str
+    new_method_body: str,
+    method_index: Optional[dict] = None
 ) -> dict:
     """
-    替换smali中的方法
+    替换smali中的方法（只替换第一个匹配的方法）
     
     Args:
         content: smali文件内容
-        method_name: 方法名
+        method_name: 方法名（或带参数的签名）
         new_method_body: 新的方法体
+        method_index: content 的方法索引（build_method_index 的结果），给出时直接按索引定位
     
     Returns:
         dict: {"success": bool, "content": str, "error": str}
     """
     try:
-        lines = content.split("\n")
-        result_lines = []
-        in_method = False
-        method_replaced = False
-        
-        for line in lines:
-            if f".method" in line and method_name in line:
-                in_method = True
-                result_lines.append(new_method_body)
-                method_replaced = True
-            elif in_method:
-                if line.strip() == ".end method":
-                    in_method = False
-                # 跳过旧方法体
-            else:
-                result_lines.append(line)
-        
-        if not method_replaced:
+        start, _, end = _locate_method(content, method_name, method_index)
+        if start < 0:
             return {
                 "success": False,
                 "content": "",
                 "error": f"Method not found: {method_name}"
             }
         
+        # 直接按偏移拼接，不重建整个文件
         return {
             "success": True,
-            "content": "\n".join(result_lines),
+            "content": content[:start] + new_method_body + content[end:],
             "error": ""
         }
     
@@ -188,11 +584,104 @@ def replace_method_in_smali(
         return {"success": False, "content": "", "error": str(e)}
 
 
+def _find_last_return(content, start: int, end: int) -> int:
+    """
+    从 end 往前查找最后一条 return 指令（return、return-void、return-object 等）
+    
+    return 总在方法末尾附近，从尾部 rfind 只需扫描很短的一段
+    
+    Args:
+        content: smali文件内容（str，或bytes/mmap）
+        start: 方法的 .method 行首偏移
+        end: 方法的 .end method 行首偏移
+    
+    Returns:
+        int: return 所在行的行首偏移，未找到时为 -1
+    """
+    needle = _typed(content, "return")
+    newline = _typed(content, "\n")
+    pos = end
+    while True:
+        idx = content.rfind(needle, start, pos)
+        if idx < 0:
+            return -1
+        line_start = content.rfind(newline, start, idx) + 1
+        # 只认行首（缩进之后）的指令，跳过字符串、标签、方法名里的 return
+        if line_start > start and not content[line_start:idx].strip():
+            return line_start
+        pos = idx
+
+
+def _line_ending(content, newline_pos: int):
+    """
+    返回在 newline_pos 处结束的那一行的换行符（"\r\n" 或 "\n"，与content同类型）
+    
+    Args:
+        content: smali文件内容（str，或bytes/mmap）
+        newline_pos: 行尾 "\n" 的偏移
+    """
+    newline = _typed(content, "\n")
+    if newline_pos > 0 and content[newline_pos - 1:newline_pos] == _typed(content, "\r"):
+        return _typed(content, "\r\n")
+    return newline
+
+
+def _with_line_ending(code, line_ending):
+    """把要插入的代码换成文件使用的换行符，避免在CRLF文件里混入单独的换行符"""
+    newline = _typed(code, "\n")
+    if line_ending == newline:
+        return code
+    return code.replace(line_ending, newline).replace(newline, line_ending)
+
+
+def _decode_text(data: bytes, encoding: str = "utf-8") -> str:
+    """按文本模式读文件的规则解码：换行符统一为 "\n"（与 read_text 的结果一致）"""
+    text = data.decode(encoding)
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _insertion_point(content, span: tuple, code_to_insert, position: str) -> tuple:
+    """
+    计算在方法中插入代码的位置
+    
+    Args:
+        content: smali文件内容（str或bytes）
+        span: _find_method_span/_locate_method 给出的方法位置
+        code_to_insert: 要插入的代码（与content同类型）
+        position: "start"（.locals 行之后）或 "end"（最后一条 return 之前）
+    
+    Returns:
+        tuple: (插入偏移, 插入文本)，无处可插时为 (-1, None)
+    """
+    start, end_start, _ = span
+    if position == "end":
+        # 插在最后一条 return 之前；没有 return（如只以 throw 结束）时插在 .end method 之前
+        pos = _find_last_return(content, start, end_start)
+        if pos < 0:
+            pos = end_start
+        # 插入点在行首，按上一行的换行符结束插入的代码
+        line_ending = _line_ending(content, pos - 1)
+        return pos, _with_line_ending(code_to_insert, line_ending) + line_ending
+    if position == "start":
+        locals_start, locals_end = _find_directive_line(content, ".locals", start)
+        if 0 <= locals_start < end_start:
+            # 按 .locals 行的换行符插入；CRLF 文件插在 "\r\n" 之前
+            line_ending = _line_ending(content, locals_end)
+            return (
+                locals_end - len(line_ending) + 1,
+                line_ending + _with_line_ending(code_to_insert, line_ending)
+            )
+    return -1, None
+
+
 def insert_smali_code(
     content: str,
     method_name: str,
     code_to_insert: str,
-    position: str = "start"  # "start", "end", or line number
+    position: str = "start",  # "start", "end", or line number
+    method_index: Optional[dict] = None
 ) -> dict:
     """
     在smali方法中插入代码
@@ -202,45 +691,27 @@ def insert_smali_code(
         method_name: 方法名
         code_to_insert: 要插入的代码
         position: 插入位置 ("start", "end", 或行号)
+        method_index: content 的方法索引（build_method_index 的结果），给出时直接按索引定位
     
     Returns:
         dict: {"success": bool, "content": str, "error": str}
     """
     try:
-        lines = content.split("\n")
-        result_lines = []
-        in_method = False
-        method_found = False
-        locals_line_idx = -1
-        
-        for i, line in enumerate(lines):
-            result_lines.append(line)
-            
-            if f".method" in line and method_name in line:
-                in_method = True
-                method_found = True
-            
-            elif in_method:
-                # 找到 .locals 行后插入（start位置）
-                if position == "start" and line.strip().startswith(".locals"):
-                    result_lines.append(code_to_insert)
-                
-                elif line.strip() == ".end method":
-                    if position == "end":
-                        # 在.end method前插入
-                        result_lines.insert(-1, code_to_insert)
-                    in_method = False
-        
-        if not method_found:
+        span = _locate_method(content, method_name, method_index)
+        if span[0] < 0:
             return {
                 "success": False,
                 "content": "",
                 "error": f"Method not found: {method_name}"
             }
         
+        # 只拼接一次：插入点之前 + 插入代码 + 插入点之后
+        pos, text = _insertion_point(content, span, code_to_insert, position)
+        if pos >= 0:
+            content = content[:pos] + text + content[pos:]
         return {
             "success": True,
-            "content": "\n".join(result_lines),
+            "content": content,
             "error": ""
         }
     
@@ -248,6 +719,144 @@ def insert_smali_code(
         return {"success": False, "content": "", "error": str(e)}
 
 
+def edit_smali_inplace(file_path: str, new_body: bytes, start: int, end: int):
+    """
+    原地把文件的 [start, end) 字节替换为 new_body：只重写 start 之后的部分并截断，
+    start 之前的内容不动
+    
+    Args:
+        file_path: 文件路径
+        new_body: 替换后的字节内容
+        start: 替换区间起点（字节偏移）
+        end: 替换区间终点（字节偏移）
+    """
+    with open(file_path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        tail = b""
+        if end < size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                tail = mm[end:size]
+        f.seek(start)
+        f.write(new_body)
+        f.write(tail)
+        f.truncate()
+
+
+def _write_edit_result(
+    file_path: str,
+    pieces: tuple,
+    method_index: Optional[dict],
+    splice: tuple
+) -> dict:
+    """
+    原地写回编辑后的内容，并为新内容保存方法索引
+    
+    Args:
+        file_path: 文件路径
+        pieces: 新内容的字节分片（拼接后解码为返回的文本）
+        method_index: 新内容的方法索引（None表示清除缓存）
+        splice: (新字节, start, end)，原地替换文件的 [start, end)
+    """
+    try:
+        content = _decode_text(b"".join(pieces))
+    except UnicodeDecodeError as e:
+        return {"success": False, "content": "", "error": str(e)}
+    try:
+        edit_smali_inplace(file_path, *splice)
+        write_result = {"success": True, "error": ""}
+    except OSError as e:
+        write_result = {"success": False, "error": str(e)}
+    result = {
+        "success": True,
+        "content": content,
+        "error": write_result["error"],
+        "write_success": write_result["success"]
+    }
+    _store_method_index(file_path, method_index if write_result["success"] else None)
+    return result
+
+
+def replace_method_in_smali_file(file_path: str, method_name: str, new_method_body: str) -> dict:
+    """
+    替换smali文件中的方法并原地写回（用缓存的方法索引定位，写回后平移更新索引）
+    
+    Args:
+        file_path: smali文件路径
+        method_name: 方法名（或带参数的签名）
+        new_method_body: 新的方法体
+    
+    Returns:
+        dict: {"success": bool, "content": str, "write_success": bool, "error": str}
+    """
+    data, error = _read_smali_bytes(file_path)
+    if error:
+        return {"success": False, "content": "", "error": error}
+    
+    index = cached_method_index(file_path, data)
+    start, _, end = _locate_method(data, method_name, index)
+    if start < 0:
+        return {"success": False, "content": "", "error": f"Method not found: {method_name}"}
+    
+    body = new_method_body.encode("utf-8")
+    pieces = (data[:start], body, data[end:])
+    return _write_edit_result(
+        file_path, pieces, _splice_index(index, start, end, body), (body, start, end)
+    )
+
+
+def insert_smali_code_file(
+    file_path: str,
+    method_name: str,
+    code_to_insert: str,
+    position: str = "start"
+) -> dict:
+    """
+    在smali文件的方法中插入代码并原地写回（用缓存的方法索引定位）
+    
+    Args:
+        file_path: smali文件路径
+        method_name: 方法名
+        code_to_insert: 要插入的代码
+        position: 插入位置 ("start", "end")
+    
+    Returns:
+        dict: {"success": bool, "content": str, "write_success": bool, "error": str}
+    """
+    data, error = _read_smali_bytes(file_path)
+    if error:
+        return {"success": False, "content": "", "error": error}
+    
+    index = cached_method_index(file_path, data)
+    span = _locate_method(data, method_name, index)
+    if span[0] < 0:
+        return {"success": False, "content": "", "error": f"Method not found: {method_name}"}
+    
+    pos, text = _insertion_point(data, span, code_to_insert.encode("utf-8"), position)
+    if pos < 0:
+        # 没有插入点（如方法没有 .locals），内容不变，不写文件（也不改动 mtime）
+        try:
+            content = _decode_text(data)
+        except UnicodeDecodeError as e:
+            return {"success": False, "content": "", "error": str(e)}
+        return {"success": True, "content": content, "error": "", "write_success": True}
+    
+    pieces = (data[:pos], text, data[pos:])
+    return _write_edit_result(file_path, pieces, _splice_index(index, pos, pos, text), (text, pos, pos))
+
+
+def _next_register(register: str) -> str:
+    """寄存器编号加一，如 v0 -> v1、v10 -> v11、p1 -> p2"""
+    prefix, number = register[:1], register[1:]
+    if not prefix or not number.isdigit():
+        raise ValueError(f"Invalid register: {register}")
+    return f"{prefix}{int(number) + 1}"
+
+
+# 代码生成是纯函数，智能体常反复生成相同的语句，按参数缓存结果
+_GENERATE_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=_GENERATE_CACHE_SIZE)
 def generate_log_smali(tag: str, message: str, register: str = "v0") -> str:
     """
     生成Log.d的smali代码
@@ -255,18 +864,38 @@ def generate_log_smali(tag: str, message: str, register: str = "v0") -> str:
     Args:
         tag: Log tag
         message: Log message
-        register: 使用的寄存器
+        register: 使用的寄存器（message使用下一个寄存器）
     
     Returns:
         str: smali代码
     """
+    register2 = _next_register(register)
     return f'''
     const-string {register}, "{tag}"
-    const-string {register.replace("0", "1")}, "{message}"
-    invoke-static {{{register}, {register.replace("0", "1")}}}, Landroid/util/Log;->d(Ljava/lang/String;Ljava/lang/String;)I
+    const-string {register2}, "{message}"
+    invoke-static {{{register}, {register2}}}, Landroid/util/Log;->d(Ljava/lang/String;Ljava/lang/String;)I
 '''
 
 
+# 返回类型 -> return语句模板
+_RETURN_VOID = "    return-void"
+_RETURN_TEMPLATES = {
+    "V": _RETURN_VOID,
+    # boolean
+    "Z": "    const/4 v0, {value}\n    return v0",
+    # int, short, byte, char
+    "I": "    const v0, {value}\n    return v0",
+    "S": "    const v0, {value}\n    return v0",
+    "B": "    const v0, {value}\n    return v0",
+    "C": "    const v0, {value}\n    return v0",
+    # long
+    "J": "    const-wide v0, {value}\n    return-wide v0"
+}
+_RETURN_OBJECT = "    return-object v0"
+_RETURN_NULL = "    const/4 v0, 0x0\n    return-object v0"
+
+
+@lru_cache(maxsize=_GENERATE_CACHE_SIZE)
 def generate_return_smali(return_type: str, value: str = None) -> str:
     """
     生成return语句的smali代码
@@ -278,22 +907,11 @@ def generate_return_smali(return_type: str, value: str = None) -> str:
     Returns:
         str: smali代码
     """
-    if return_type == "V":
-        return "    return-void"
-    elif return_type == "Z":
-        # boolean
-        val = "0x1" if value == "true" else "0x0"
-        return f"    const/4 v0, {val}\n    return v0"
-    elif return_type in ["I", "S", "B", "C"]:
-        # int, short, byte, char
-        return f"    const v0, {value or '0x0'}\n    return v0"
-    elif return_type == "J":
-        # long
-        return f"    const-wide v0, {value or '0x0'}\n    return-wide v0"
-    elif return_type.startswith("L") or return_type.startswith("["):
-        # object or array
-        if value == "null":
-            return "    const/4 v0, 0x0\n    return-object v0"
-        return "    return-object v0"
-    else:
-        return "    return-void"
+    # object or array
+    if return_type[:1] in ("L", "["):
+        return _RETURN_NULL if value == "null" else _RETURN_OBJECT
+    
+    template = _RETURN_TEMPLATES.get(return_type, _RETURN_VOID)
+    if return_type == "Z":
+        value = "0x1" if value == "true" else "0x0"
+    return template.format(value=value or "0x0")
@@ -25,7 +25,8 @@ def register_search_tools(server: Server):
                 case_sensitive=arguments.get("case_sensitive", False),
                 is_regex=arguments.get("is_regex", False),
                 max_results=arguments.get("max_results", 100),
-                context_lines=arguments.get("context_lines", 2)
+                context_lines=arguments.get("context_lines", 2),
+                offset=arguments.get("offset", 0)
             )
             return [TextContent(type="text", text=json.dumps(result, indent=2, ensure_ascii=False))]
         
@@ -95,6 +96,10 @@ def register_search_tools(server: Server):
                         "context_lines": {
                             "type": "integer",
                             "description": "上下文行数"
+                        },
+                        "offset": {
+                            "type": "integer",
+                            "description": "结果偏移量（结果被截断时传入返回的next_offset继续获取）"
                         }
                     },
                     "required": ["directory", "pattern"]
@@ -1,231 +1,574 @@
 """Smali代码操作相关的MCP工具"""
 from mcp.server import Server
 from mcp.types import Tool, TextContent
-import json
-from pathlib import Path
-
-from ..smali_utils import (
-    parse_smali_class,
-    get_method_from_smali,
-    replace_method_in_smali,
-    insert_smali_code,
-    generate_log_smali,
-    generate_return_smali
+import asyncio
+import hashlib
+import os
+import threading
+import weakref
+from contextlib import nullcontext
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional
+
+from ..file_utils import encode_text, read_file, resolved_path, write_file
+from ..json_utils import to_text
+
+try:
+    from jsonschema import Draft202012Validator
+except ImportError:  # 较旧的mcp不依赖jsonschema，此时只检查必填参数
+    Draft202012Validator = None
+
+
+def _smali_utils():
+    """smali操作模块（第一次用到smali工具时才导入，不拖慢服务启动）"""
+    from .. import smali_utils
+    return smali_utils
+
+
+# 文件缓存：路径 -> ((mtime_ns, size), 结果, 占用字节)。每个文件只保留一条，文件变化后新结果覆盖旧条目，
+# 不会因为反复编辑同一文件而堆积旧版本的内容
+# 每个缓存按文件大小合计不超过 _CACHE_MAX_BYTES（单个文件最大可到 MAX_FILE_SIZE），条目数不超过 _CACHE_SIZE
+_CACHE_SIZE = 256
+_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_read_cache: OrderedDict = OrderedDict()
+_parse_cache: OrderedDict = OrderedDict()
+_cache_stats = {id(cache): {"hits": 0, "misses": 0, "bytes": 0} for cache in (_read_cache, _parse_cache)}
+_cache_lock = threading.Lock()
+
+
+def _cached(cache: OrderedDict, path: str, version: tuple, build: Callable[[], dict]) -> dict:
+    """
+    按路径查缓存，(mtime_ns, size) 一致时命中，否则调用 build 重新生成并覆盖该路径的条目
+    
+    Args:
+        cache: 要使用的缓存
+        path: 文件路径
+        version: 文件的 (mtime_ns, size)
+        build: 未命中时生成结果
+    """
+    stats = _cache_stats[id(cache)]
+    with _cache_lock:
+        entry = cache.get(path)
+        if entry is not None and entry[0] == version:
+            cache.move_to_end(path)
+            stats["hits"] += 1
+            return entry[1]
+        stats["misses"] += 1
+    
+    value = build()
+    with _cache_lock:
+        # 按文件大小计占用：读取结果就是文件内容，解析结果与文件大小同量级；失败结果几乎不占空间
+        cost = version[1] if value.get("success") else 0
+        old = cache.pop(path, None)
+        if old is not None:
+            stats["bytes"] -= old[2]
+        cache[path] = (version, value, cost)
+        stats["bytes"] += cost
+        # 淘汰最久未用的条目，刚放入的这一条总是保留
+        while len(cache) > 1 and (len(cache) > _CACHE_SIZE or stats["bytes"] > _CACHE_MAX_BYTES):
+            stats["bytes"] -= cache.popitem(last=False)[1][2]
+    return value
+
+
+def _cache_info(cache: OrderedDict) -> dict:
+    """缓存命中统计"""
+    stats = _cache_stats[id(cache)]
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "maxsize": _CACHE_SIZE,
+        "currsize": len(cache),
+        "maxbytes": _CACHE_MAX_BYTES,
+        "currbytes": stats["bytes"]
+    }
+
+
+def _cached_read(path: str, mtime_ns: int, size: int) -> dict:
+    """按路径缓存文件读取结果，文件被修改后自然失效"""
+    return _cached(_read_cache, path, (mtime_ns, size), lambda: read_file(path))
+
+
+def _cached_parse(path: str, mtime_ns: int, size: int) -> dict:
+    """按路径缓存类解析结果"""
+    def build():
+        file_result = _cached_read(path, mtime_ns, size)
+        if not file_result["success"]:
+            return file_result
+        return {**_smali_utils().parse_smali_class(file_result["content"]), "success": True}
+    return _cached(_parse_cache, path, (mtime_ns, size), build)
+
+
+def _file_key(path: str) -> tuple:
+    """取缓存键；文件不存在等情况返回None，交给read_file报告错误"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_mtime_ns, st.st_size
+
+
+def _parse_smali(path: str) -> dict:
+    """解析smali文件（走缓存）。返回的dict是共享的，不要修改"""
+    key = _file_key(path)
+    if key is None:
+        return read_file(path)
+    return _cached_parse(*key)
+
+
+# 多个工具共用的参数定义（只读共享，不要修改）
+_FILE_PATH_PROP = {"type": "string", "description": "smali文件路径"}
+_METHOD_NAME_PROP = {"type": "string", "description": "方法名"}
+
+# 工具定义只在导入时构建一次，list_tools 每次直接返回
+_SMALI_TOOLS = (
+    Tool(
+        name="smali_parse",
+        description="解析smali类文件，提取类名、方法、字段等信息",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": _FILE_PATH_PROP
+            },
+            "required": ["file_path"]
+        }
+    ),
+    Tool(
+        name="smali_get_method",
+        description="从smali文件中提取指定方法的代码",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": _FILE_PATH_PROP,
+                "method_name": _METHOD_NAME_PROP
+            },
+            "required": ["file_path", "method_name"]
+        }
+    ),
+    Tool(
+        name="smali_replace_method",
+        description="替换smali文件中的方法实现",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": _FILE_PATH_PROP,
+                "method_name": _METHOD_NAME_PROP,
+                "new_method_body": {
+                    "type": "string",
+                    "description": "新的方法体（完整的.method到.end method）"
+                }
+            },
+            "required": ["file_path", "method_name", "new_method_body"]
+        }
+    ),
+    Tool(
+        name="smali_insert_code",
+        description="在smali方法中插入代码",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "file_path": _FILE_PATH_PROP,
+                "method_name": _METHOD_NAME_PROP,
+                "code": {
+                    "type": "string",
+                    "description": "要插入的smali代码"
+                },
+                "position": {
+                    "type": "string",
+                    "enum": ["start", "end"],
+                    "default": "start",
+                    "description": "插入位置：start(方法开头) 或 end(return前)"
+                }
+            },
+            "required": ["file_path", "method_name", "code"]
+        }
+    ),
+    Tool(
+        name="smali_gen_log",
+        description="生成Log.d调用的smali代码",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "tag": {
+                    "type": "string",
+                    "description": "Log TAG"
+                },
+                "message": {
+                    "type": "string",
+                    "description": "Log消息"
+                },
+                "register": {
+                    "type": "string",
+                    "default": "v0",
+                    "description": "使用的寄存器，默认v0"
+                }
+            },
+            "required": ["tag", "message"]
+        }
+    ),
+    Tool(
+        name="smali_gen_return",
+        description="生成return语句的smali代码",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "return_type": {
+                    "type": "string",
+                    "description": "返回类型：V(void), Z(boolean), I(int), J(long), L...(对象)"
+                },
+                "value": {
+                    "type": "string",
+                    "description": "返回值（可选）"
+                }
+            },
+            "required": ["return_type"]
+        }
+    ),
+    Tool(
+        name="smali_cache_stats",
+        description="查看smali文件读取/解析缓存的命中统计（调试用）",
+        inputSchema={
+            "type": "object",
+            "properties": {}
+        }
+    ),
+    Tool(
+        name="smali_batch",
+        description="批量执行多个smali_*操作（一次调用）；同一文件的多次修改只在最后写入一次",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ops": {
+                    "type": "array",
+                    "description": "操作列表，按顺序执行",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {
+                                "type": "string",
+                                "description": "工具名，如 smali_replace_method"
+                            },
+                            "args": {
+                                "type": "object",
+                                "description": "该工具的参数"
+                            }
+                        },
+                        "required": ["name"]
+                    }
+                },
+                "stop_on_error": {
+                    "type": "boolean",
+                    "default": False,
+                    "description": "遇到失败时是否停止后续操作，默认false"
+                }
+            },
+            "required": ["ops"]
+        }
+    ),
 )
-from ..file_utils import read_file, write_file
 
 
-def register_smali_tools(server: Server):
-    """注册Smali操作工具"""
+# 路径 -> 锁，弱引用：没有线程持有或等待某个文件的锁时条目自动消失，长时间运行也不会堆积
+_file_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(path: str) -> threading.RLock:
+    """取文件对应的锁（同一路径共用一把；调用方在使用期间持有返回值即可保证它不被回收）"""
+    with _file_locks_guard:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = threading.RLock()
+        return lock
+
+
+def _reply(result: dict) -> list[TextContent]:
+    """把结果序列化为工具返回内容（有orjson时用orjson；大结果不缩进）"""
+    return [TextContent(type="text", text=to_text(result))]
+
+
+def _run_with_file(
+    path: str,
+    op: Callable[[str, Optional[dict]], dict],
+    *,
+    write_back: bool = False,
+    pending: Optional[dict] = None
+) -> dict:
+    """
+    读取文件 -> op(content, method_index) -> 按需写回
     
-    @server.call_tool()
-    async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-        if name == "smali_parse":
-            # 先读取文件
-            file_result = read_file(arguments["file_path"])
-            if not file_result["success"]:
-                return [TextContent(type="text", text=json.dumps(file_result, indent=2, ensure_ascii=False))]
-            
-            result = parse_smali_class(file_result["content"])
-            result["success"] = True
-            return [TextContent(type="text", text=json.dumps(result, indent=2, ensure_ascii=False))]
-        
-        elif name == "smali_get_method":
-            file_result = read_file(arguments["file_path"])
-            if not file_result["success"]:
-                return [TextContent(type="text", text=json.dumps(file_result, indent=2, ensure_ascii=False))]
-            
-            result = get_method_from_smali(
-                content=file_result["content"],
-                method_name=arguments["method_name"]
-            )
-            return [TextContent(type="text", text=json.dumps(result, indent=2, ensure_ascii=False))]
-        
-        elif name == "smali_replace_method":
-            file_result = read_file(arguments["file_path"])
+    Args:
+        path: smali文件路径
+        op: 接收文件内容和它的方法索引（可能为None）、返回结果dict的操作
+        write_back: 操作成功后是否把结果中的 content 写回文件
+        pending: 批量执行时的待写入表 {路径: [原内容, 新内容, 结果列表, 读取时的文件键]}；
+                 给出时从表中取最新内容，修改只记入表中，由 smali_batch 最后统一写回
+    
+    Returns:
+        dict: 操作结果
+    """
+    # 读-改-写期间持有该文件的锁（处理函数在线程中执行），避免并发修改互相覆盖
+    with _file_lock(path) if pending is None else nullcontext():
+        if pending is not None and path in pending:
+            original, content = pending[path][0], pending[path][1]
+            method_index = key = None
+        else:
+            key = _file_key(path)
+            if key is None:
+                return read_file(path)
+            file_result = _cached_read(*key)
             if not file_result["success"]:
-                return [TextContent(type="text", text=json.dumps(file_result, indent=2, ensure_ascii=False))]
-            
-            result = replace_method_in_smali(
-                content=file_result["content"],
-                method_name=arguments["method_name"],
-                new_method_body=arguments["new_method_body"]
-            )
-            
-            if result["success"]:
-                # 写回文件
-                write_result = write_file(arguments["file_path"], result["content"])
-                result["write_success"] = write_result["success"]
-                if not write_result["success"]:
-                    result["error"] = write_result["error"]
-            
-            return [TextContent(type="text", text=json.dumps(result, indent=2, ensure_ascii=False))]
+                return file_result
+            original = content = file_result["content"]
+            # 与服务端的文件编辑共用 smali_utils 的方法索引缓存
+            method_index = _smali_utils().cached_method_index(path, content, key[1:])
         
-        elif name == "smali_insert_code":
-            file_result = read_file(arguments["file_path"])
-            if not file_result["success"]:
-                return [TextContent(type="text", text=json.dumps(file_result, indent=2, ensure_ascii=False))]
-            
-            result = insert_smali_code(
-                content=file_result["content"],
-                method_name=arguments["method_name"],
-                code_to_insert=arguments["code"],
-                position=arguments.get("position", "start")
-            )
-            
-            if result["success"]:
-                write_result = write_file(arguments["file_path"], result["content"])
-                result["write_success"] = write_result["success"]
-                if not write_result["success"]:
-                    result["error"] = write_result["error"]
-            
-            return [TextContent(type="text", text=json.dumps(result, indent=2, ensure_ascii=False))]
+        result = op(content, method_index)
         
-        elif name == "smali_gen_log":
-            code = generate_log_smali(
-                tag=arguments["tag"],
-                message=arguments["message"],
-                register=arguments.get("register", "v0")
-            )
-            return [TextContent(type="text", text=json.dumps({
-                "success": True,
-                "code": code
-            }, indent=2, ensure_ascii=False))]
+        if write_back and result["success"]:
+            if pending is not None:
+                entry = pending.setdefault(path, [original, content, [], key])
+                entry[1] = result["content"]
+                entry[2].append(result)
+            else:
+                _apply_write(path, result["content"], original, (result,))
+    
+    return result
+
+
+def _apply_write(
+    path: str,
+    content: str,
+    original: str,
+    results: Iterable[dict],
+    read_key: Optional[tuple] = None
+) -> bool:
+    """
+    写回文件，并把写入结果记到各个操作结果中
+    
+    写入成功时结果里不再带整个文件内容（可能有几MB），只给写入字节数和内容摘要，
+    需要新内容时由调用方自己读取；写入失败时保留 content 便于重试
+    
+    Args:
+        read_key: 读取文件时的 _file_key；给出时先确认文件此后没有被修改，
+                  被修改过则放弃写入（smali_batch 读和写之间不持有锁，避免覆盖别的修改）
+    
+    Returns:
+        bool: 是否写入成功
+    """
+    with _file_lock(path):
+        if read_key is not None and _file_key(path) != read_key:
+            write_result = {"success": False, "error": f"File changed during batch, not written: {path}"}
+        else:
+            write_result = write_file(path, content, prev_content=original)
+    
+    if write_result["success"]:
+        # 与 write_file 落盘的字节一致（含换行符转换）
+        data = encode_text(content)
+        patch = {
+            "bytes_written": 0 if write_result.get("skipped") else len(data),
+            "sha256": hashlib.sha256(data).hexdigest()[:16]
+        }
+        if write_result.get("skipped"):
+            patch["skipped"] = True
+    
+    for result in results:
+        result["write_success"] = write_result["success"]
+        if write_result["success"]:
+            result.pop("content", None)
+            result.update(patch)
+        else:
+            result["error"] = write_result["error"]
+    return write_result["success"]
+
+
+async def _handle_smali_parse(arguments: dict, pending: Optional[dict] = None) -> dict:
+    path = resolved_path(arguments["file_path"])
+    if pending is not None and path in pending:
+        return {**_smali_utils().parse_smali_class(pending[path][1]), "success": True}
+    # 读取并解析文件（文件未变化时直接用缓存）；文件IO和解析放到线程里，不阻塞事件循环
+    return await asyncio.to_thread(_parse_smali, path)
+
+
+async def _handle_smali_get_method(arguments: dict, pending: Optional[dict] = None) -> dict:
+    return await asyncio.to_thread(
+        _run_with_file,
+        resolved_path(arguments["file_path"]),
+        lambda content, method_index: _smali_utils().get_method_from_smali(
+            content=content,
+            method_name=arguments["method_name"],
+            method_index=method_index
+        ),
+        pending=pending
+    )
+
+
+async def _handle_smali_replace_method(arguments: dict, pending: Optional[dict] = None) -> dict:
+    return await asyncio.to_thread(
+        _run_with_file,
+        resolved_path(arguments["file_path"]),
+        lambda content, method_index: _smali_utils().replace_method_in_smali(
+            content=content,
+            method_name=arguments["method_name"],
+            new_method_body=arguments["new_method_body"],
+            method_index=method_index
+        ),
+        write_back=True,
+        pending=pending
+    )
+
+
+async def _handle_smali_insert_code(arguments: dict, pending: Optional[dict] = None) -> dict:
+    return await asyncio.to_thread(
+        _run_with_file,
+        resolved_path(arguments["file_path"]),
+        lambda content, method_index: _smali_utils().insert_smali_code(
+            content=content,
+            method_name=arguments["method_name"],
+            code_to_insert=arguments["code"],
+            position=arguments["position"],
+            method_index=method_index
+        ),
+        write_back=True,
+        pending=pending
+    )
+
+
+async def _handle_smali_gen_log(arguments: dict, pending: Optional[dict] = None) -> dict:
+    code = _smali_utils().generate_log_smali(
+        tag=arguments["tag"],
+        message=arguments["message"],
+        register=arguments["register"]
+    )
+    return {"success": True, "code": code}
+
+
+async def _handle_smali_gen_return(arguments: dict, pending: Optional[dict] = None) -> dict:
+    code = _smali_utils().generate_return_smali(
+        return_type=arguments["return_type"],
+        value=arguments.get("value")
+    )
+    return {"success": True, "code": code}
+
+
+async def _handle_smali_cache_stats(arguments: dict, pending: Optional[dict] = None) -> dict:
+    return {
+        "success": True,
+        "read_cache": _cache_info(_read_cache),
+        "parse_cache": _cache_info(_parse_cache)
+    }
+
+
+async def _handle_smali_batch(arguments: dict, pending: Optional[dict] = None) -> dict:
+    """
+    在一次调用内顺序执行多个smali_*操作；同一文件的多次修改在内存中累积，最后每个文件只写一次
+    
+    Returns:
+        dict: {"success": bool, "results": list, "error": str}
+    """
+    pending = {}
+    results = []
+    all_success = True
+    
+    for op in arguments["ops"]:
+        op_name = op.get("name", "")
+        handler = _DISPATCH.get(op_name)
+        if handler is None or op_name == "smali_batch":
+            op_result = {"success": False, "error": f"Unsupported batch operation: {op_name}"}
+        else:
+            op_args, error = _prepare_arguments(op_name, op.get("args") or {})
+            if error:
+                op_result = {"success": False, "error": error}
+            else:
+                try:
+                    op_result = await handler(op_args, pending)
+                except Exception as e:
+                    op_result = {"success": False, "error": str(e)}
         
-        elif name == "smali_gen_return":
-            code = generate_return_smali(
-                return_type=arguments["return_type"],
-                value=arguments.get("value")
-            )
-            return [TextContent(type="text", text=json.dumps({
-                "success": True,
-                "code": code
-            }, indent=2, ensure_ascii=False))]
+        results.append({"name": op_name, "result": op_result})
+        if not op_result.get("success"):
+            all_success = False
+            if arguments["stop_on_error"]:
+                break
+    
+    # 统一写回被修改的文件（文件在批量执行期间被别的调用改过时不写，并报告失败）
+    for path, (original, content, path_results, read_key) in pending.items():
+        if not await asyncio.to_thread(_apply_write, path, content, original, path_results, read_key):
+            all_success = False
+    
+    return {"success": all_success, "results": results, "error": ""}
+
+
+# 工具名 -> 处理函数（返回结果dict，由 call_tool 统一序列化）
+_DISPATCH: dict[str, Callable[..., Awaitable[dict]]] = {
+    "smali_parse": _handle_smali_parse,
+    "smali_get_method": _handle_smali_get_method,
+    "smali_replace_method": _handle_smali_replace_method,
+    "smali_insert_code": _handle_smali_insert_code,
+    "smali_gen_log": _handle_smali_gen_log,
+    "smali_gen_return": _handle_smali_gen_return,
+    "smali_cache_stats": _handle_smali_cache_stats,
+    "smali_batch": _handle_smali_batch,
+}
+
+
+# 各工具可选参数的默认值（取自 inputSchema 的 default），校验通过后合并到arguments中
+_DEFAULTS: dict[str, dict] = {
+    tool.name: {
+        key: prop["default"]
+        for key, prop in tool.inputSchema["properties"].items()
+        if "default" in prop
+    }
+    for tool in _SMALI_TOOLS
+}
+# 各工具的必填参数（没有jsonschema时的退路）
+_REQUIRED_ARGS: dict[str, tuple] = {
+    tool.name: tuple(tool.inputSchema.get("required", ())) for tool in _SMALI_TOOLS
+}
+# 工具名 -> 预先编译好的参数校验器，在 register_smali_tools 时构建
+_VALIDATORS: dict = {}
+
+
+def _prepare_arguments(name: str, arguments: dict) -> tuple:
+    """
+    校验参数并补上默认值，参数不合法时不进入任何处理逻辑
+    
+    Args:
+        name: 工具名
+        arguments: 调用参数
+    
+    Returns:
+        tuple: (合并了默认值的参数, 错误信息)，参数合法时错误信息为空串
+    """
+    validator = _VALIDATORS.get(name)
+    if validator is not None:
+        error = next(validator.iter_errors(arguments), None)
+        if error is not None:
+            return arguments, error.message
+    else:
+        missing = [arg for arg in _REQUIRED_ARGS.get(name, ()) if arg not in arguments]
+        if missing:
+            return arguments, f"Missing required arguments: {', '.join(missing)}"
+    return _DEFAULTS.get(name, {}) | arguments, ""
+
+
+def register_smali_tools(server: Server):
+    """注册Smali操作工具"""
+    if Draft202012Validator is not None and not _VALIDATORS:
+        _VALIDATORS.update(
+            (tool.name, Draft202012Validator(tool.inputSchema)) for tool in _SMALI_TOOLS
+        )
+    
+    @server.call_tool()
+    async def call_tool(name: str, arguments: dict) -> list[TextContent]:
+        handler = _DISPATCH.get(name)
+        if handler is None:
+            return [TextContent(type="text", text=f"Unknown tool: {name}")]
         
-        return [TextContent(type="text", text=f"Unknown tool: {name}")]
+        arguments, error = _prepare_arguments(name, arguments)
+        if error:
+            return _reply({"success": False, "error": error})
+        return _reply(await handler(arguments))
     
     @server.list_tools()
     async def list_tools() -> list[Tool]:
-        return [
-            Tool(
-                name="smali_parse",
-                description="解析smali类文件，提取类名、方法、字段等信息",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "file_path": {
-                            "type": "string",
-                            "description": "smali文件路径"
-                        }
-                    },
-                    "required": ["file_path"]
-                }
-            ),
-            Tool(
-                name="smali_get_method",
-                description="从smali文件中提取指定方法的代码",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "file_path": {
-                            "type": "string",
-                            "description": "smali文件路径"
-                        },
-                        "method_name": {
-                            "type": "string",
-                            "description": "方法名"
-                        }
-                    },
-                    "required": ["file_path", "method_name"]
-                }
-            ),
-            Tool(
-                name="smali_replace_method",
-                description="替换smali文件中的方法实现",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "file_path": {
-                            "type": "string",
-                            "description": "smali文件路径"
-                        },
-                        "method_name": {
-                            "type": "string",
-                            "description": "方法名"
-                        },
-                        "new_method_body": {
-                            "type": "string",
-                            "description": "新的方法体（完整的.method到.end method）"
-                        }
-                    },
-                    "required": ["file_path", "method_name", "new_method_body"]
-                }
-            ),
-            Tool(
-                name="smali_insert_code",
-                description="在smali方法中插入代码",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "file_path": {
-                            "type": "string",
-                            "description": "smali文件路径"
-                        },
-                        "method_name": {
-                            "type": "string",
-                            "description": "方法名"
-                        },
-                        "code": {
-                            "type": "string",
-                            "description": "要插入的smali代码"
-                        },
-                        "position": {
-                            "type": "string",
-                            "enum": ["start", "end"],
-                            "description": "插入位置：start(方法开头) 或 end(return前)"
-                        }
-                    },
-                    "required": ["file_path", "method_name", "code"]
-                }
-            ),
-            Tool(
-                name="smali_gen_log",
-                description="生成Log.d调用的smali代码",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "tag": {
-                            "type": "string",
-                            "description": "Log TAG"
-                        },
-                        "message": {
-                            "type": "string",
-                            "description": "Log消息"
-                        },
-                        "register": {
-                            "type": "string",
-                            "description": "使用的寄存器，默认v0"
-                        }
-                    },
-                    "required": ["tag", "message"]
-                }
-            ),
-            Tool(
-                name="smali_gen_return",
-                description="生成return语句的smali代码",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "return_type": {
-                            "type": "string",
-                            "description": "返回类型：V(void), Z(boolean), I(int), J(long), L...(对象)"
-                        },
-                        "value": {
-                            "type": "string",
-                            "description": "返回值（可选）"
-                        }
-                    },
-                    "required": ["return_type"]
-                }
-            )
-        ]
+        return list(_SMALI_TOOLS)
@@ -12,14 +12,17 @@ os.chdir(SCRIPT_DIR)
 # 添加到Python路径
 sys.path.insert(0, SCRIPT_DIR)
 
-# 设置环境变量
-os.environ.setdefault("APKEDITOR_JAR", os.path.join(SCRIPT_DIR, "libs", "APKEditor.jar"))
-os.environ.setdefault("DEX_EDITOR_JAR", os.path.join(SCRIPT_DIR, "libs", "dex-editor.jar"))
-os.environ.setdefault("APK_WORKSPACE", os.path.join(SCRIPT_DIR, "workspace"))
-os.environ.setdefault("JADX_PATH", os.path.join(SCRIPT_DIR, "libs", "jadx", "bin", "jadx.bat"))
-os.environ.setdefault("WORKSPACE_DIR", SCRIPT_DIR)
-
-from apk_editor_mcp.server import main
+# 设置环境变量（已设置的保持不变，只为未设置的拼接默认路径）
+for key, parts in (
+    ("APKEDITOR_JAR", ("libs", "APKEditor.jar")),
+    ("DEX_EDITOR_JAR", ("libs", "dex-editor.jar")),
+    ("APK_WORKSPACE", ("workspace",)),
+    ("JADX_PATH", ("libs", "jadx", "bin", "jadx.bat")),
+    ("WORKSPACE_DIR", ()),
+):
+    if key not in os.environ:
+        os.environ[key] = os.path.join(SCRIPT_DIR, *parts)
 
 if __name__ == "__main__":
+    from apk_editor_mcp.server import main
     main()
@@ -0,0 +1,52 @@
+"""search_utils 分页测试"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from apk_editor_mcp.search_utils import search_in_files
+
+
+class SearchInFilesPagingTest(unittest.TestCase):
+    """search_in_files 的 max_results/offset 分页"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directory = self._tmp.name
+        Path(self.directory, "A.smali").write_text(
+            "".join(f'const-string v0, "hit{i}"\n' for i in range(3)), encoding="utf-8"
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _search(self, **kwargs) -> dict:
+        return search_in_files(self.directory, "hit", **kwargs)
+
+    def test_zero_max_results_returns_one_result(self):
+        result = self._search(max_results=0)
+        self.assertTrue(result["success"], result["error"])
+        self.assertEqual(len(result["results"]), 1)
+        self.assertTrue(result["truncated"])
+        self.assertEqual(result["next_offset"], 1)
+
+    def test_negative_max_results_returns_one_result(self):
+        result = self._search(max_results=-1)
+        self.assertTrue(result["success"], result["error"])
+        self.assertEqual(len(result["results"]), 1)
+        self.assertEqual(result["next_offset"], 1)
+
+    def test_next_offset_pages_through_all_results(self):
+        lines, offset = [], 0
+        while True:
+            result = self._search(max_results=0, offset=offset)
+            self.assertTrue(result["success"], result["error"])
+            lines.extend(r["line_number"] for r in result["results"])
+            if not result["truncated"]:
+                break
+            self.assertGreater(result["next_offset"], offset)
+            offset = result["next_offset"]
+        self.assertEqual(lines, [1, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
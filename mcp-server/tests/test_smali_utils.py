@@ -0,0 +1,68 @@
+"""smali_utils 原地插入测试"""
+import tempfile
+import unittest
+from pathlib import Path
+
+from apk_editor_mcp.smali_utils import get_method_from_smali_file, insert_smali_code_file
+
+_SMALI = (
+    ".class public LA;\n"
+    ".super Ljava/lang/Object;\n"
+    "\n"
+    ".method public foo()V\n"
+    "    .locals 1\n"
+    "\n"
+    "    return-void\n"
+    ".end method\n"
+)
+
+
+class InsertSmaliCodeFileTest(unittest.TestCase):
+    """insert_smali_code_file 按文件原有的换行符插入"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.file_path = str(Path(self._tmp.name, "A.smali"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _insert(self, line_ending: str, position: str) -> tuple[bytes, dict]:
+        Path(self.file_path).write_bytes(_SMALI.replace("\n", line_ending).encode("utf-8"))
+        result = insert_smali_code_file(self.file_path, "foo", "    nop\n    nop", position)
+        self.assertTrue(result["success"], result["error"])
+        self.assertTrue(result["write_success"], result["error"])
+        return Path(self.file_path).read_bytes(), result
+
+    def test_start_insert_lf(self):
+        data, _ = self._insert("\n", "start")
+        self.assertIn(b"    .locals 1\n    nop\n    nop\n\n    return-void\n", data)
+
+    def test_end_insert_lf(self):
+        data, _ = self._insert("\n", "end")
+        self.assertIn(b"\n    nop\n    nop\n    return-void\n", data)
+
+    def test_start_insert_crlf(self):
+        data, result = self._insert("\r\n", "start")
+        self.assertIn(b"    .locals 1\r\n    nop\r\n    nop\r\n\r\n    return-void\r\n", data)
+        self.assertEqual(data.count(b"\n"), data.count(b"\r\n"))
+        self.assertNotIn("\r", result["content"])
+
+    def test_end_insert_crlf(self):
+        data, result = self._insert("\r\n", "end")
+        self.assertIn(b"\r\n    nop\r\n    nop\r\n    return-void\r\n", data)
+        self.assertEqual(data.count(b"\n"), data.count(b"\r\n"))
+        self.assertNotIn("\r", result["content"])
+
+    def test_get_method_crlf_returns_lf_text(self):
+        self._insert("\r\n", "end")
+        method = get_method_from_smali_file(self.file_path, "foo")
+        self.assertTrue(method["success"], method["error"])
+        self.assertEqual(
+            method["method"],
+            ".method public foo()V\n    .locals 1\n\n    nop\n    nop\n    return-void\n.end method\n"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()